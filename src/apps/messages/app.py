@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import typing as t
+
+from aiohttp import web
+
+from apps.messages.cache import message_cache
+from apps.messages.presence import PresenceTracker
+from conf import settings
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_CHANNEL = 'presence'
+
+
+def setup(app: web.Application) -> None:
+    """
+    Adds the presence tracker of websocket users and metrics of the messages app.
+    """
+
+    app.ws_presence = PresenceTracker(
+        connections=app.ws_conns,
+        typing_timeout=settings.WS_TYPING_TIMEOUT,
+        sync_interval=settings.WS_PRESENCE_SYNC_INTERVAL,
+    )
+    app.ws_presence_ticker = None
+    app.ws_backplane_handlers[PRESENCE_CHANNEL] = lambda payload: receive_presence(app, payload)
+
+    metrics.register('ws.presence', lambda: app.ws_presence.stats)
+    metrics.register('messages.cache', lambda: message_cache.stats)
+
+    app.on_startup.append(startup_presence)
+    app.on_cleanup.append(cleanup_presence)
+
+
+async def startup_presence(app: web.Application) -> None:
+    app.ws_presence_ticker = asyncio.ensure_future(publish_presence(app))
+
+
+async def cleanup_presence(app: web.Application) -> None:
+    app.ws_presence_ticker.cancel()
+
+
+def broadcast_presence(app: web.Application, events: t.Iterable[t.Tuple[t.Optional[str], t.Any]]) -> None:
+    for topic, event in events:
+        app.ws_broadcaster.broadcast(event, topic=topic)
+
+
+def receive_presence(app: web.Application, payload: t.Mapping[str, t.Any]) -> None:
+    """
+    Applies the state published by another worker, the own one is already applied.
+    """
+
+    state = payload['state']
+
+    if state['worker'] != app.ws_presence.worker_id:
+        broadcast_presence(app, app.ws_presence.apply(state))
+
+
+async def publish_presence(app: web.Application) -> None:
+    """
+    Publishes presence and typing changes of this worker once per tick.
+    A failed tick is logged and its changes are sent with the next full state.
+    """
+
+    while True:
+        await asyncio.sleep(settings.WS_PRESENCE_TICK)
+
+        try:
+            broadcast_presence(app, app.ws_presence.expire_workers())
+            state = app.ws_presence.collect_state()
+
+            if state is not None:
+                broadcast_presence(app, app.ws_presence.apply(state))
+                await app.ws_backplane.publish({'channel': PRESENCE_CHANNEL, 'state': state})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Cannot publish presence.')
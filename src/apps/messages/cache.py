@@ -0,0 +1,18 @@
+from conf import settings
+from core.cache import LRUCache
+
+# serialized messages by uuid, versioned by the message version
+message_cache = LRUCache(
+    max_size=settings.MESSAGE_CACHE_SIZE,
+    ttl=settings.MESSAGE_CACHE_TTL,
+)
+
+
+def invalidate_authored_messages(author_uuid: str) -> None:
+    """
+    Forgets the messages of an author whose representation has changed.
+    """
+
+    message_cache.delete_where(
+        lambda message: (message.get('author') or {}).get('id') == author_uuid,
+    )
@@ -1,6 +1,7 @@
 import uuid
 import datetime
 
+from conf import settings
 from core.db import models
 
 
@@ -8,6 +9,8 @@ class MessageModel(models.Model):
     _id = models.Field(is_required=False)
     uuid = models.UUIDField(default=uuid.uuid4)
     text = models.Field(default='')
+    room = models.Field(default=settings.DEFAULT_ROOM)
     author_uuid = models.UUIDField()
-    created_at = models.Field(default=datetime.datetime.now)
-    updated_at = models.Field(is_required=False)
+    created_at = models.DateTimeField(default=datetime.datetime.now)
+    updated_at = models.DateTimeField(is_required=False)
+    version = models.Field(default=0, is_required=False)  # incremented by every update
@@ -0,0 +1,229 @@
+import typing as t
+import time
+import uuid
+
+from apps.messages.ws import ChannelActions, room_topic
+from core.ws.registry import ConnectionRegistry
+
+Events = t.List[t.Tuple[t.Optional[str], t.Dict[str, t.Any]]]
+
+
+class WorkerPresence:
+    """
+    Users connected to one worker and the ones typing there by room.
+    """
+
+    __slots__ = ('online', 'typing', 'seen_at')
+
+    def __init__(self) -> None:
+        self.online: t.Set[str] = set()
+        self.typing: t.Dict[str, t.Set[str]] = {}
+        self.seen_at = time.monotonic()
+
+
+class PresenceTracker:
+    """
+    Aggregates online presence and typing indicators of users.
+
+    Nothing is sent when a user connects, disconnects or types. Instead,
+    collect_state is called once per tick and returns the changes of this
+    worker, which are published to the other workers. Every worker keeps
+    the state of each worker, a user is online while connected to any of
+    them, so clients receive at most one presence delta and one typing
+    snapshot per changed room per tick.
+
+    A worker sends its full state every sync_interval seconds, which fixes
+    lost changes and tells it's alive. A worker not heard from for
+    3 sync intervals is considered gone with all its users.
+    """
+
+    def __init__(self, connections: ConnectionRegistry, typing_timeout: float, sync_interval: float) -> None:
+        self.worker_id = uuid.uuid4().hex
+        self.connections = connections
+        self.typing_timeout = typing_timeout
+        self.sync_interval = sync_interval
+        # state of this worker: the published online users and typists with their expiration time
+        self.local_online: t.Set[str] = set()
+        self.local_typing: t.Dict[str, t.Dict[str, float]] = {}
+        self._changed_rooms = set()
+        self._synced_at = 0.0
+        # state of every worker including this one
+        self.workers: t.Dict[str, WorkerPresence] = {}
+        # user -> the number of workers the user is connected to
+        self.online: t.Dict[str, int] = {}
+
+    def set_typing(self, room: str, user_uuid: str) -> None:
+        """
+        Marks the user as typing in the room for typing_timeout seconds.
+        Repeated calls only prolong the mark.
+        """
+
+        typists = self.local_typing.setdefault(room, {})
+
+        if user_uuid not in typists:
+            self._changed_rooms.add(room)
+
+        typists[user_uuid] = time.monotonic() + self.typing_timeout
+
+    def stop_typing(self, room: str, user_uuid: str) -> None:
+        typists = self.local_typing.get(room, {})
+
+        if typists.pop(user_uuid, None) is not None:
+            self._changed_rooms.add(room)
+
+    def get_snapshot(self) -> t.Dict[str, t.Any]:
+        # users of this worker connected since the last tick are online as well
+        return {'online': sorted(self.connections.users.union(self.online)), 'offline': []}
+
+    def collect_state(self) -> t.Optional[t.Dict[str, t.Any]]:
+        """
+        Returns changes of this worker since the previous call, or
+        its full state once per sync_interval, or None if nothing changed.
+        """
+
+        now = time.monotonic()
+        online = self.connections.users
+        joined, left = online - self.local_online, self.local_online - online
+        self.local_online = online
+
+        for room, typists in list(self.local_typing.items()):
+            expired = [u for u, expires_at in typists.items() if expires_at <= now]
+
+            for user_uuid in expired:
+                del typists[user_uuid]
+
+            if expired:
+                self._changed_rooms.add(room)
+
+            if not typists:
+                del self.local_typing[room]
+
+        full = now - self._synced_at >= self.sync_interval
+
+        if full:
+            self._synced_at = now
+            state = {
+                'worker': self.worker_id,
+                'full': True,
+                'online': sorted(online),
+                'typing': {room: sorted(typists) for room, typists in self.local_typing.items()},
+            }
+        elif joined or left or self._changed_rooms:
+            state = {
+                'worker': self.worker_id,
+                'full': False,
+                'joined': sorted(joined),
+                'left': sorted(left),
+                'typing': {room: sorted(self.local_typing.get(room, ())) for room in self._changed_rooms},
+            }
+        else:
+            state = None
+
+        self._changed_rooms.clear()
+        return state
+
+    def apply(self, state: t.Mapping[str, t.Any]) -> Events:
+        """
+        Takes the state published by a worker and returns (topic, event)
+        pairs describing how the aggregated presence has changed.
+        """
+
+        worker = self.workers.get(state['worker'])
+
+        if worker is None:
+            worker = self.workers[state['worker']] = WorkerPresence()
+
+        worker.seen_at = time.monotonic()
+
+        if state['full']:
+            online = set(state['online'])
+            joined, left = online - worker.online, worker.online - online
+            typing = {room: set(users) for room, users in state['typing'].items()}
+            typing.update((room, set()) for room in worker.typing if room not in typing)
+        else:
+            joined, left = set(state['joined']), set(state['left'])
+            typing = {room: set(users) for room, users in state['typing'].items()}
+
+        return self._update_worker(worker, joined, left, typing)
+
+    def expire_workers(self) -> Events:
+        """
+        Forgets the workers which haven't sent their state for too long.
+        """
+
+        events = []
+        expired_at = time.monotonic() - 3 * self.sync_interval
+
+        for worker_id, worker in list(self.workers.items()):
+            if worker_id != self.worker_id and worker.seen_at < expired_at:
+                events.extend(self._update_worker(
+                    worker,
+                    joined=set(),
+                    left=set(worker.online),
+                    typing={room: set() for room in worker.typing},
+                ))
+                del self.workers[worker_id]
+
+        return events
+
+    def _update_worker(
+            self,
+            worker: WorkerPresence,
+            joined: t.Set[str],
+            left: t.Set[str],
+            typing: t.Mapping[str, t.Set[str]],
+    ) -> Events:
+        events = []
+        came_online, went_offline = [], []
+
+        for user_uuid in joined - worker.online:
+            worker.online.add(user_uuid)
+            self.online[user_uuid] = self.online.get(user_uuid, 0) + 1
+
+            if self.online[user_uuid] == 1:
+                came_online.append(user_uuid)
+
+        for user_uuid in left & worker.online:
+            worker.online.discard(user_uuid)
+            self.online[user_uuid] -= 1
+
+            if not self.online[user_uuid]:
+                del self.online[user_uuid]
+                went_offline.append(user_uuid)
+
+        if came_online or went_offline:
+            events.append((None, {
+                'action': ChannelActions.PRESENCE,
+                'data': {'online': sorted(came_online), 'offline': sorted(went_offline)},
+            }))
+
+        for room, typists in typing.items():
+            if worker.typing.get(room, set()) == typists:
+                continue
+
+            if typists:
+                worker.typing[room] = typists
+            else:
+                worker.typing.pop(room, None)
+
+            users = set()
+
+            for other in self.workers.values():
+                users.update(other.typing.get(room, ()))
+
+            events.append((room_topic(room), {
+                'action': ChannelActions.TYPING,
+                'data': {'room': room, 'users': sorted(users)},
+            }))
+
+        return events
+
+    @property
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            'workers': len(self.workers),
+            'online': len(self.online),
+            'local_online': len(self.local_online),
+            'typing_rooms': len(self.local_typing),
+            'typists': sum(len(typists) for typists in self.local_typing.values()),
+        }
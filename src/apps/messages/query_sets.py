@@ -1,8 +1,80 @@
+import typing as t
+
+from apps.messages.cache import message_cache
 from apps.messages.models import MessageModel
-from core.db.query_sets import MongoDBQuerySet
+from core.db.indexes import Index
+from core.db.query_sets import MongoDBQuerySet, SaveResult
 from conf import settings
 
 
 class MessagesQS(MongoDBQuerySet):
     collection_name = settings.MESSAGES_COLLECTION
     model_class = MessageModel
+    indexes = [
+        Index('uuid', unique=True),
+        Index('author_uuid'),
+        # the history of a room is paged by keyset over (created_at, _id)
+        Index('room', '-created_at', '-_id'),
+    ]
+
+    def filter_by_room(self, room: str) -> MongoDBQuerySet:
+        if room == settings.DEFAULT_ROOM:
+            # messages created before rooms appeared belong to the default room
+            return self.filter(where={'room': {'$in': [room, None]}})
+
+        return self.filter(where={'room': room})
+
+    async def update_one(
+            self,
+            where: t.Mapping[str, t.Any],
+            data: t.Mapping[str, t.Any],
+            increment: t.Mapping[str, t.Union[int, float]] = None,
+    ) -> t.Optional[MessageModel]:
+        """
+        Loads the message and writes the data with save, so messages have
+        one write path bumping the version and evicting the cached representation.
+        """
+
+        message = await self.get_one(where=where)
+
+        if message is None:
+            return None
+
+        message.set_values(data)
+
+        if await self.save(message, where=where, increment=increment) is SaveResult.NOT_FOUND:
+            return None
+
+        return message
+
+    async def save(
+            self,
+            model: MessageModel,
+            where: t.Optional[t.Mapping[str, t.Any]] = None,
+            increment: t.Mapping[str, t.Union[int, float]] = None,
+    ) -> SaveResult:
+        """
+        Bumps the version of a changed message, so cached
+        representations of the previous version aren't served anymore.
+        """
+
+        result = await super().save(
+            model=model,
+            where=where,
+            increment=dict(increment or {}, version=1),
+        )
+
+        if result is SaveResult.SAVED:
+            message_cache.delete(model.uuid)
+
+        return result
+
+    async def delete_one(self, where: t.Mapping[str, t.Any]):
+        result = await super().delete_one(where)
+
+        if 'uuid' in where:
+            message_cache.delete(where['uuid'])
+        else:
+            message_cache.clear()
+
+        return result
@@ -1,22 +1,25 @@
+from apps.messages.cache import message_cache
 from apps.users.query_sets import UsersQS
 from apps.users.serializers import UserSerializer
+from conf import settings
 from core.serialization.serializers import Serializer
 from core.serialization import fields
-from core.serialization.typings import SerializedData, DeserializedData
+from core.serialization.typings import DeserializedData
 
 
 class MessageSerializer(Serializer):
+    cache = message_cache
+
     id = fields.UUIDField(load_from='uuid', serialization_only=True)
     text = fields.TextField(min_length=1, max_length=100)
+    room = fields.TextField(max_length=100, value_for_missing=settings.DEFAULT_ROOM)
     created_at = fields.DateTimeField(serialization_only=True)
-    author = fields.RefField(serializer_class=UserSerializer, serialization_only=True)
-
-    async def serialize(self, data: SerializedData) -> SerializedData:
-        db = self.context.get('request').app.mongo
-        author = await UsersQS(db=db).get_by_uuid(data['author_uuid'])
-        data['author'] = author.as_dict
-        serialized_data = await super().serialize(data)
-        return serialized_data
+    author = fields.RefField(
+        serializer_class=UserSerializer,
+        query_set_class=UsersQS,
+        load_from='author_uuid',
+        serialization_only=True,
+    )
 
     async def deserialize(
             self,
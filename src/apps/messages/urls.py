@@ -18,6 +18,13 @@ patterns = (
         name='messages:create',
     ),
 
+    url(
+        method='POST',
+        path='/messages/bulk/',
+        handler=messages_views.MessageBulkCreateApiView,
+        name='messages:bulk_create',
+    ),
+
     url(
         method='GET',
         path=f'/messages/{{message_uuid:{UUID_REGEX}}}/',
@@ -45,4 +52,11 @@ patterns = (
         handler=messages_ws.WSView,
         name='messages:chat',
     ),
+
+    url(
+        method='GET',
+        path='/ws/connections/',
+        handler=messages_views.WSConnectionsApiView,
+        name='messages:chat_connections',
+    ),
 )
@@ -1,14 +1,22 @@
+import typing as t
+from http import HTTPStatus
+
+from aiohttp.web_response import Response
+
 from apps.messages.models import MessageModel
 from apps.messages.permissions import IsMessageOwner
 from apps.messages.query_sets import MessagesQS
 from apps.messages.serializers import MessageSerializer
-from core.serialization.typings import SerializedData
+from core.serialization.typings import DeserializedData, SerializedData
 from apps.messages.ws import WSCHatChanel
 
+from conf import settings
 from core import views as core_views
 from core.authentication import TokenAuthentication
 from core.db.models import Model
-from core.permissions import IsAuthenticated
+from core.paginators import KeysetPaginator
+from core.permissions import IsAdmin, IsAuthenticated
+from core.responses import json_response
 
 
 class MessageListApiView(core_views.ListApiView):
@@ -16,6 +24,13 @@ class MessageListApiView(core_views.ListApiView):
     permission_classes = [IsAuthenticated]
     serializer_class = MessageSerializer
     query_set_class = MessagesQS
+    use_identity_map = True
+    paginator_class = KeysetPaginator
+    room_query_param = 'room'
+
+    async def get_objects(self) -> MessagesQS:
+        room = self.request.query.get(self.room_query_param, settings.DEFAULT_ROOM)
+        return self.get_query_set().filter_by_room(room)
 
 
 class MessageDetailApiView(core_views.DetailApiView):
@@ -23,6 +38,7 @@ class MessageDetailApiView(core_views.DetailApiView):
     permission_classes = [IsAuthenticated]
     serializer_class = MessageSerializer
     query_set_class = MessagesQS
+    use_identity_map = True
     url_param = 'message_uuid'
     lookup_field = 'uuid'
 
@@ -38,16 +54,28 @@ class MessageCreateApiView(core_views.CreateApiView):
         return data
 
 
+class MessageBulkCreateApiView(core_views.BulkCreateApiView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = MessageSerializer
+    query_set_class = MessagesQS
+
+    async def post_serialize(self, data: t.List[SerializedData]) -> t.List[SerializedData]:
+        await WSCHatChanel(self.request).add_messages(data)
+        return data
+
+
 class MessageDeleteView(core_views.DestroyApiView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, IsMessageOwner]
     query_set_class = MessagesQS
+    use_identity_map = True
     url_param = 'message_uuid'
     lookup_field = 'uuid'
 
     async def destroy(self, model: MessageModel) -> None:
         await super().destroy(model)
-        await WSCHatChanel(self.request).delete_message({'id': model.uuid})
+        await WSCHatChanel(self.request).delete_message({'id': model.uuid, 'room': model.room})
 
 
 class MessageUpdateView(core_views.UpdateApiView):
@@ -55,9 +83,36 @@ class MessageUpdateView(core_views.UpdateApiView):
     permission_classes = [IsAuthenticated, IsMessageOwner]
     serializer_class = MessageSerializer
     query_set_class = MessagesQS
+    use_identity_map = True
     url_param = 'message_uuid'
     lookup_field = 'uuid'
 
+    async def deserialize(self, data: SerializedData, partial: bool = False) -> DeserializedData:
+        deserialized_data = await super().deserialize(data, partial=partial)
+        # a message can't be moved to another room
+        deserialized_data.pop('room', None)
+        return deserialized_data
+
     async def post_serialize(self, data: SerializedData) -> SerializedData:
         await WSCHatChanel(self.request).update_message(data)
         return data
+
+
+class WSConnectionsApiView(core_views.ApiView):
+    """
+    Shows the resources accounted for every websocket of this worker.
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    async def get(self) -> Response:
+        connections = self.request.app.ws_conns
+
+        return json_response(
+            data={
+                'totals': connections.stats,
+                'connections': [c.stats for c in connections],
+            },
+            status=HTTPStatus.OK.value,
+        )
@@ -1,18 +1,61 @@
 import typing as t
+import asyncio
 import enum
+import logging
 
 from aiohttp.web_request import Request
 from aiohttp.abc import AbstractView
-from aiohttp import web
+from aiohttp import web, WSMsgType
 
+from apps.messages.permissions import IsMessageOwner
+from apps.messages.query_sets import MessagesQS
+from apps.messages.serializers import MessageSerializer
+from conf import settings
+from core.db.query_sets import SaveResult
+from core.serialization.exceptions import ValidationError
 from core.serialization.typings import SerializedData
 from core.authentication import TokenAuthentication
+from core.ws.codecs import Frame, codecs, get_codec
+from core.ws.connections import WSConnection
+
+
+logger = logging.getLogger(__name__)
 
 
 class ChannelActions(str, enum.Enum):
     ADD_MESSAGE = 'add_message'
+    ADD_MESSAGES = 'add_messages'
     UPDATE_MESSAGE = 'update_message'
     DELETE_MESSAGE = 'delete_message'
+    SUBSCRIBED = 'subscribed'
+    UNSUBSCRIBED = 'unsubscribed'
+    RESUMED = 'resumed'
+    RESYNC = 'resync'
+    ACK = 'ack'
+    PONG = 'pong'
+    PRESENCE = 'presence'
+    TYPING = 'typing'
+    ERROR = 'error'
+
+
+class ClientActions(str, enum.Enum):
+    SUBSCRIBE = 'subscribe'
+    UNSUBSCRIBE = 'unsubscribe'
+    RESUME = 'resume'
+    PING = 'ping'
+    TYPING = 'typing'
+    SEND_MESSAGE = 'send_message'
+    EDIT_MESSAGE = 'edit_message'
+    DELETE_MESSAGE = 'delete_message'
+
+
+class CommandError(Exception):
+    def __init__(self, details: str) -> None:
+        self.details = details
+
+
+def room_topic(room: str) -> str:
+    return f'room:{room}'
 
 
 class WSCHatChanel:
@@ -20,12 +63,30 @@ class WSCHatChanel:
         self.request = request
 
     async def send(self, action: ChannelActions, data: SerializedData) -> None:
-        for ws_conn in self.request.app.ws_conns:
-            await ws_conn.send_json({'action': action, 'data': data})
+        await self.request.app.ws_backplane.publish({
+            'topic': room_topic(data.get('room', settings.DEFAULT_ROOM)),
+            'event': {'action': action, 'data': data},
+        })
 
     async def add_message(self, data: SerializedData) -> None:
         await self.send(action=ChannelActions.ADD_MESSAGE, data=data)
 
+    async def add_messages(self, data: t.Sequence[SerializedData]) -> None:
+        """
+        Sends messages created at once as one event per room.
+        """
+
+        rooms = {}
+
+        for message in data:
+            rooms.setdefault(message.get('room', settings.DEFAULT_ROOM), []).append(message)
+
+        for room, messages in rooms.items():
+            await self.request.app.ws_backplane.publish({
+                'topic': room_topic(room),
+                'event': {'action': ChannelActions.ADD_MESSAGES, 'data': messages},
+            })
+
     async def update_message(self, data: SerializedData) -> None:
         await self.send(action=ChannelActions.UPDATE_MESSAGE, data=data)
 
@@ -34,36 +95,296 @@ class WSCHatChanel:
 
 
 class WSView(AbstractView):
+    command_handlers: t.Mapping[ClientActions, str] = {
+        ClientActions.SUBSCRIBE: 'subscribe',
+        ClientActions.UNSUBSCRIBE: 'unsubscribe',
+        ClientActions.RESUME: 'resume',
+        ClientActions.PING: 'ping',
+        ClientActions.TYPING: 'typing',
+        ClientActions.SEND_MESSAGE: 'send_message',
+        ClientActions.EDIT_MESSAGE: 'edit_message',
+        ClientActions.DELETE_MESSAGE: 'delete_message',
+    }
+
+    # commands which are acknowledged and may run concurrently,
+    # other commands are handled one by one in the order of arrival
+    pipelined_actions: t.Collection[ClientActions] = (
+        ClientActions.SEND_MESSAGE,
+        ClientActions.EDIT_MESSAGE,
+        ClientActions.DELETE_MESSAGE,
+    )
+
+    def __init__(self, request: Request) -> None:
+        super().__init__(request)
+        self.connection = None
+        self.inflight_commands = asyncio.Semaphore(settings.WS_MAX_INFLIGHT_COMMANDS)
+        self.pending_commands = set()
+
     def __await__(self) -> t.Generator[t.Any, None, t.Any]:
         return self.process().__await__()
 
     async def init_ws(self) -> web.WebSocketResponse:
-        ws = web.WebSocketResponse()
+        ws = web.WebSocketResponse(
+            heartbeat=settings.WS_HEARTBEAT,
+            protocols=tuple(codecs),
+        )
         await ws.prepare(self.request)
         return ws
 
-    async def connect_ws(self, ws: web.WebSocketResponse) -> None:
-        self.request.app.ws_conns.append(ws)
+    async def connect_ws(self, ws: web.WebSocketResponse) -> WSConnection:
+        connection = WSConnection(
+            ws,
+            queue_size=settings.WS_OUTBOUND_QUEUE_SIZE,
+            policy=settings.WS_SLOW_CONSUMER_POLICY,
+            user_uuid=self.request.user.uuid,
+            coalesce_window=settings.WS_COALESCE_WINDOW,
+            coalesce_max_events=settings.WS_COALESCE_MAX_EVENTS,
+            codec=get_codec(ws.ws_protocol),
+        )
+        connection.start()
+        self.connection = connection
+        self.request.app.ws_conns.add(connection)
+        self.request.app.ws_conns.subscribe(connection, room_topic(settings.DEFAULT_ROOM))
+        self.send_event(ChannelActions.PRESENCE, self.request.app.ws_presence.get_snapshot())
+        return connection
 
-    async def disconnect_ws(self, ws: web.WebSocketResponse) -> None:
-        self.request.app.ws_conns.pop(ws)
+    async def disconnect_ws(self, connection: WSConnection) -> None:
+        connection.stop()
 
-    async def perform_authentication(self, ws: web.WebSocketResponse) -> None:
+    async def perform_authentication(self, ws: web.WebSocketResponse) -> bool:
         user = await TokenAuthentication().authenticate(self.request)
 
         if not user:
             await ws.close()
+            return False
 
         self.request.user = user
+        return True
+
+    def send_event(self, action: ChannelActions, data: SerializedData, command_id: t.Any = None) -> None:
+        event = {'action': action, 'data': data}
+
+        if command_id is not None:
+            event['id'] = command_id
+
+        self.connection.send_payload(event)
+
+    def send_error(self, message: str, command_id: t.Any = None) -> None:
+        self.send_event(ChannelActions.ERROR, {'message': message}, command_id)
+
+    def get_room(self, data: t.Mapping[str, t.Any]) -> t.Optional[str]:
+        room = data.get('room')
+
+        if not room or not isinstance(room, str):
+            self.send_error('The room must be a non-empty string.')
+            return
+
+        return room
+
+    async def subscribe(self, data: t.Mapping[str, t.Any]) -> None:
+        room = self.get_room(data)
+
+        if not room:
+            return
+
+        if len(self.connection.topics) >= settings.WS_MAX_ROOMS_PER_CONNECTION:
+            self.send_error('Too many rooms.')
+            return
+
+        self.request.app.ws_conns.subscribe(self.connection, room_topic(room))
+        self.send_event(ChannelActions.SUBSCRIBED, {'room': room})
+
+    async def unsubscribe(self, data: t.Mapping[str, t.Any]) -> None:
+        room = self.get_room(data)
+
+        if not room:
+            return
+
+        self.request.app.ws_conns.unsubscribe(self.connection, room_topic(room))
+        self.send_event(ChannelActions.UNSUBSCRIBED, {'room': room})
+
+    async def resume(self, data: t.Mapping[str, t.Any]) -> None:
+        """
+        Replays events of the subscribed rooms which were delivered
+        after the sequence number known by the client. If these events
+        aren't kept anymore, asks the client to fetch the rooms from scratch.
+        """
+
+        seq = data.get('seq')
+
+        if not isinstance(seq, int) or isinstance(seq, bool):
+            self.send_error('The seq must be an integer.')
+            return
+
+        event_log = self.request.app.ws_event_log
+        events = event_log.since(seq, topics=self.connection.topics, epoch=data.get('epoch'))
+        position = {'epoch': event_log.epoch, 'seq': event_log.last_seq}
+
+        if events is None:
+            self.send_event(ChannelActions.RESYNC, position)
+            return
+
+        for event in events:
+            self.connection.send_payload(event)
+
+        self.send_event(ChannelActions.RESUMED, position)
+
+    async def ping(self, data: t.Mapping[str, t.Any]) -> None:
+        self.send_event(ChannelActions.PONG, data)
+
+    async def typing(self, data: t.Mapping[str, t.Any]) -> None:
+        room = self.get_room(data)
+
+        if not room:
+            return
+
+        if room_topic(room) not in self.connection.topics:
+            self.send_error('Subscribe to the room first.')
+            return
+
+        self.request.app.ws_presence.set_typing(room, self.request.user.uuid)
+
+    def get_serializer(self) -> MessageSerializer:
+        return MessageSerializer(context={'request': self.request})
+
+    async def get_own_message(self, data: t.Mapping[str, t.Any]):
+        message_uuid = data.get('id')
+
+        if not message_uuid or not isinstance(message_uuid, str):
+            raise CommandError('The id must be a non-empty string.')
+
+        message = await MessagesQS(db=self.request.app.mongo).get_one(where={'uuid': message_uuid})
+
+        if not message:
+            raise CommandError('Not found.')
+
+        if not await IsMessageOwner().has_object_permission(self.request, message):
+            raise CommandError('Forbidden.')
+
+        return message
+
+    async def send_message(self, data: t.Mapping[str, t.Any]) -> SerializedData:
+        serializer = self.get_serializer()
+        deserialized_data = await serializer.deserialize(data)
+        model = MessagesQS.model_class(**deserialized_data)
+        message = await MessagesQS(db=self.request.app.mongo).insert_one(model)
+        serialized_data = await serializer.serialize(message.as_dict)
+        await WSCHatChanel(self.request).add_message(serialized_data)
+        self.request.app.ws_presence.stop_typing(message.room, self.request.user.uuid)
+        return serialized_data
+
+    async def edit_message(self, data: t.Mapping[str, t.Any]) -> SerializedData:
+        message = await self.get_own_message(data)
+        serializer = self.get_serializer()
+        deserialized_data = await serializer.deserialize(data)
+        deserialized_data.pop('room', None)
+        message.set_values(deserialized_data)
+        result = await MessagesQS(db=self.request.app.mongo).save(message, where={'uuid': message.uuid})
+
+        if result is SaveResult.NOT_FOUND:
+            raise CommandError('Not found.')
+
+        serialized_data = await serializer.serialize(message.as_dict)
+
+        if result is SaveResult.SAVED:
+            await WSCHatChanel(self.request).update_message(serialized_data)
+
+        return serialized_data
+
+    async def delete_message(self, data: t.Mapping[str, t.Any]) -> SerializedData:
+        message = await self.get_own_message(data)
+        await MessagesQS(db=self.request.app.mongo).delete_one(where={'uuid': message.uuid})
+        deleted_data = {'id': message.uuid, 'room': message.room}
+        await WSCHatChanel(self.request).delete_message(deleted_data)
+        return deleted_data
+
+    async def run_pipelined(self, handler: t.Callable, command_id: t.Any, data: t.Mapping[str, t.Any]) -> None:
+        """
+        Runs a pipelined command and answers with an ack carrying
+        the command id, or with an error carrying the same id.
+        """
+
+        try:
+            result = await handler(data)
+        except (ValidationError, CommandError) as e:
+            self.send_event(ChannelActions.ERROR, {'errors': e.details}, command_id)
+        except asyncio.CancelledError:
+            # the connection is closed, there is nobody to answer
+            raise
+        except Exception:
+            logger.exception('Websocket command %s failed.', handler.__name__)
+            self.send_error('Internal error.', command_id)
+        else:
+            self.send_event(ChannelActions.ACK, result, command_id)
+        finally:
+            self.inflight_commands.release()
+
+    async def handle_command(self, frame: Frame) -> None:
+        """
+        Decodes a command like {"action": "subscribe", "data": {"room": "general"}}
+        and passes its data to the handler of the action.
+
+        Pipelined commands like {"action": "send_message", "id": 1, "data": {"text": "hi"}}
+        run concurrently, up to WS_MAX_INFLIGHT_COMMANDS per connection.
+        When the limit is reached, reading of the next commands waits.
+        """
+
+        try:
+            command = self.connection.codec.decode(frame)
+            action = ClientActions(command['action'])
+            data = command.get('data') or {}
+            command_id = command.get('id')
+
+            if not isinstance(data, dict):
+                raise TypeError('The data must be an object.')
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_error('Malformed command.')
+            return
+
+        handler = getattr(self, self.command_handlers[action])
+
+        if action not in self.pipelined_actions:
+            await handler(data)
+            return
+
+        await self.inflight_commands.acquire()
+        task = asyncio.ensure_future(self.run_pipelined(handler, command_id, data))
+        self.pending_commands.add(task)
+        task.add_done_callback(self.pending_commands.discard)
+
+    async def cancel_pending_commands(self) -> None:
+        """
+        Cancels the pipelined commands of a closed connection and waits for them,
+        so they don't run against the closed socket.
+        """
+
+        tasks = list(self.pending_commands)
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     async def listen_to_ws(self, ws: web.WebSocketResponse) -> None:
-        async for _ in ws:
-            pass
+        expected_type = WSMsgType.BINARY if self.connection.codec.binary else WSMsgType.TEXT
+
+        async for message in ws:
+            if message.type == expected_type:
+                self.connection.touch(len(message.data))
+                await self.handle_command(message.data)
 
     async def process(self) -> web.WebSocketResponse:
         current_ws = await self.init_ws()
-        await self.perform_authentication(current_ws)
-        await self.connect_ws(current_ws)
-        await self.listen_to_ws(current_ws)
-        await self.disconnect_ws(current_ws)
+
+        if not await self.perform_authentication(current_ws):
+            return current_ws
+
+        connection = await self.connect_ws(current_ws)
+
+        try:
+            await self.listen_to_ws(current_ws)
+        finally:
+            await self.cancel_pending_commands()
+            await self.disconnect_ws(connection)
+
         return current_ws
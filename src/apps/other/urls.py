@@ -9,4 +9,11 @@ patterns = (
         handler=other_views.OpenApiSpecificationView,
         name='api:specification',
     ),
+
+    url(
+        method='GET',
+        path='/metrics/',
+        handler=other_views.MetricsView,
+        name='api:metrics',
+    ),
 )
@@ -1,8 +1,12 @@
 import yaml
 
-from aiohttp.web_response import json_response, Response
+from aiohttp.web_response import Response
 
 from core import views as core_views
+from core.authentication import TokenAuthentication
+from core.metrics import metrics
+from core.permissions import IsAdmin, IsAuthenticated
+from core.responses import json_response
 from conf import settings
 
 
@@ -11,3 +15,11 @@ class OpenApiSpecificationView(core_views.ApiView):
         with open(settings.API_SPECIFICATION_PATH) as spec:
             loaded_spec = yaml.load(spec)
         return json_response(data=loaded_spec)
+
+
+class MetricsView(core_views.ApiView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    async def get(self) -> Response:
+        return json_response(data=metrics.collect())
@@ -10,6 +10,7 @@ class UserModel(models.Model):
     username = models.Field(default='')
     uuid = models.UUIDField(default=uuid.uuid4)
     password = models.Field()
+    is_admin = models.Field(default=False, is_required=False)
 
     def set_password(self, password: str) -> None:
         self.password = hash_password(password)
@@ -19,5 +20,6 @@ class AccessTokenModel(models.Model):
     _id = models.Field(is_required=False)
     token = models.Field()
     user_uuid = models.UUIDField()
-    created_at = models.Field(default=datetime.datetime.now)
-    revoked_at = models.Field(is_required=False)
+    # UTC, as MongoDB expires documents of the TTL index by it
+    created_at = models.DateTimeField(default=datetime.datetime.utcnow)
+    revoked_at = models.DateTimeField(is_required=False)
@@ -2,12 +2,17 @@ import typing as t
 
 from apps.users.models import UserModel, AccessTokenModel
 from conf import settings
+from core.db.indexes import Index
 from core.db.query_sets import MongoDBQuerySet
 
 
 class UsersQS(MongoDBQuerySet):
     collection_name = settings.USERS_COLLECTION
     model_class = UserModel
+    indexes = [
+        Index('uuid', unique=True),
+        Index('username', unique=True),
+    ]
 
     async def get_by_username(self, username: str) -> t.Optional[UserModel]:
         return await self.get_one(where={'username': username})
@@ -19,3 +24,7 @@ class UsersQS(MongoDBQuerySet):
 class AccessTokenQS(MongoDBQuerySet):
     collection_name = settings.ACCESS_TOKEN_COLLECTION
     model_class = AccessTokenModel
+    indexes = [
+        # tokens are useless once their JWT expires
+        Index('created_at', expire_after_seconds=settings.JWT_EXP_SECONDS),
+    ]
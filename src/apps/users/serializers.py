@@ -17,15 +17,18 @@ class UserSerializer(Serializer):
     async def deserialize(self, data: t.Dict[str, t.Any], partial: bool=False) -> DeserializedData:
         deserialized_data = await super().deserialize(data, partial=partial)
 
-        username = deserialized_data['username']
-        db = self.context['request'].app.mongo
-        user = await UsersQS(db=db).get_by_username(username)
+        if 'username' in deserialized_data:
+            username = deserialized_data['username']
+            db = self.context['request'].app.mongo
+            user = await UsersQS(db=db).get_by_username(username)
+
+            if user:
+                raise ValidationError('This username is already in use.')
 
-        if user:
-            raise ValidationError('This username is already in use.')
+        if 'password' in deserialized_data:
+            hashed_password = hash_password(deserialized_data['password'])
+            deserialized_data['password'] = hashed_password
 
-        hashed_password = hash_password(deserialized_data['password'])
-        deserialized_data['password'] = hashed_password
         return deserialized_data
 
 
@@ -1,8 +1,12 @@
+import typing as t
+
+from apps.messages.cache import invalidate_authored_messages
 from apps.users.models import UserModel
 from apps.users.query_sets import UsersQS, AccessTokenQS
 from apps.users.serializers import UserSerializer, AccessTokenSerializer
 from core import views as core_views
 from core.authentication import TokenAuthentication
+from core.db.counts import EstimatedCount
 from core.permissions import IsAuthenticated
 
 
@@ -11,6 +15,10 @@ class UserListApiView(core_views.ListApiView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
     query_set_class = UsersQS
+    # the list isn't filtered, so the collection metadata has the total
+    count_strategy = EstimatedCount()
+    # the page is read from the cursor and written by chunks
+    stream = True
 
 
 class UserDetailApiView(core_views.DetailApiView):
@@ -44,11 +52,12 @@ class CurrentUserDetailApiView(core_views.DetailApiView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
     query_set_class = UsersQS
+    use_identity_map = True
 
     async def get_object(self) -> UserModel:
         return (
             await
-            self.query_set_class(db=self.db)
+            self.get_query_set()
             .get_by_uuid(self.request.user.uuid)
         )
 
@@ -58,24 +67,38 @@ class CurrentUserUpdateApiView(core_views.UpdateApiView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
     query_set_class = UsersQS
+    use_identity_map = True
+    lookup_field = 'uuid'
 
     async def get_object(self) -> UserModel:
         return (
             await
-            self.query_set_class(db=self.db)
+            self.get_query_set()
             .get_by_uuid(self.request.user.uuid)
         )
 
+    async def update(self, obj: UserModel, data: t.Mapping[str, t.Any]) -> UserModel:
+        user = await super().update(obj, data)
+        invalidate_authored_messages(obj.uuid)
+        return user
+
 
 class CurrentUserPatchApiView(core_views.PatchApiView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
     query_set_class = UsersQS
+    use_identity_map = True
+    lookup_field = 'uuid'
 
     async def get_object(self) -> UserModel:
         return (
             await
-            self.query_set_class(db=self.db)
+            self.get_query_set()
             .get_by_uuid(self.request.user.uuid)
         )
+
+    async def update(self, obj: UserModel, data: t.Mapping[str, t.Any]) -> UserModel:
+        user = await super().update(obj, data)
+        invalidate_authored_messages(obj.uuid)
+        return user
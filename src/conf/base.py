@@ -7,14 +7,36 @@ SECRET_KEY = os.getenv('SECRET_KEY', '')
 
 MONGO_URL = os.getenv('MONGO_URL')
 
+# "stdlib", "orjson" (if installed) or "auto" to pick the fastest installed one.
+# Used for every HTTP response, websocket frame and backplane message.
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'stdlib')
+
 URLS = [
     'apps.messages.urls',
     'apps.users.urls',
     'apps.other.urls',
 ]
 
+# Query sets which declared indexes are built by "sync_indexes" and,
+# unless ENSURE_INDEXES_ON_STARTUP is off, when the application starts.
+INDEXED_QUERY_SET_CLASSES = [
+    'apps.messages.query_sets.MessagesQS',
+    'apps.users.query_sets.UsersQS',
+    'apps.users.query_sets.AccessTokenQS',
+]
+ENSURE_INDEXES_ON_STARTUP = os.getenv('ENSURE_INDEXES_ON_STARTUP', '1') == '1'
+
+# Functions called with the application when it's created, e.g. to add
+# startup hooks, backplane channel handlers or metrics of an app.
+APP_SETUP_FUNCTIONS = [
+    'apps.messages.app.setup',
+]
+
 CLI_COMMAND_CLASSES = [
     'scripts.populate_db.PopulateDBAppCommand',
+    'scripts.make_admin.MakeAdminAppCommand',
+    'scripts.benchmark_models.BenchmarkModelsAppCommand',
+    'scripts.sync_indexes.SyncIndexesAppCommand',
 ]
 
 
@@ -22,8 +44,60 @@ MESSAGES_COLLECTION = 'messages'
 USERS_COLLECTION = 'users'
 ACCESS_TOKEN_COLLECTION = 'access_tokens'
 
+# Serialized messages are cached in every worker. An entry lives
+# at most MESSAGE_CACHE_TTL seconds, so edits made by other workers
+# are visible after that time at the latest.
+MESSAGE_CACHE_SIZE = 10000
+MESSAGE_CACHE_TTL = 5*60
+
+# Counts of CachedCount paginators are served while the collection
+# isn't changed by this worker, writes of other workers are seen
+# after COUNT_CACHE_TTL seconds at the latest.
+COUNT_CACHE_SIZE = 1000
+COUNT_CACHE_TTL = 30
+
+# Every database operation is timed, ones slower than DB_SLOW_QUERY_MS
+# are logged with the shape of their filter. The last DB_SLOW_QUERY_LOG_SIZE
+# of them are shown in /metrics/ together with their plans if
+# DB_EXPLAIN_SLOW_QUERIES is on, which costs an explain per slow query.
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 100))
+DB_SLOW_QUERY_LOG_SIZE = 100
+DB_EXPLAIN_SLOW_QUERIES = os.getenv('DB_EXPLAIN_SLOW_QUERIES', '0') == '1'
+
 JWT_EXP_SECONDS = 24*60*60  # one day
 
+DEFAULT_ROOM = 'general'
+
+WS_HEARTBEAT = 30  # seconds between server pings, a socket without a pong is closed
+# Sockets which haven't sent anything (e.g. a "ping" command) for this number
+# of seconds are closed. None disables the reaper, heartbeats still detect dead peers.
+WS_IDLE_TIMEOUT = None
+WS_REAP_INTERVAL = 30
+
+WS_OUTBOUND_QUEUE_SIZE = 256  # frames waiting to be written to one websocket
+WS_SLOW_CONSUMER_POLICY = 'disconnect'  # "drop" or "disconnect"
+WS_MAX_ROOMS_PER_CONNECTION = 50
+WS_MAX_INFLIGHT_COMMANDS = 16  # pipelined commands running at once for one websocket
+
+# Presence and typing changes are aggregated and sent once per tick (in seconds).
+# A typing indicator disappears if it isn't repeated within WS_TYPING_TIMEOUT.
+WS_PRESENCE_TICK = 1.0
+WS_TYPING_TIMEOUT = 5.0
+WS_PRESENCE_SYNC_INTERVAL = 10.0  # seconds between full presence states of a worker
+
+# Events queued for a websocket within the window (in seconds) are written
+# as one JSON array frame of at most WS_COALESCE_MAX_EVENTS events.
+# A single event is written as is. Zero window disables coalescing.
+WS_COALESCE_WINDOW = float(os.getenv('WS_COALESCE_WINDOW', 0))
+WS_COALESCE_MAX_EVENTS = 50
+
+# InProcessBackplane serves a single worker, HubBackplane relays
+# events between workers through "python src/cli.py backplane_hub".
+WS_BACKPLANE_CLASS = os.getenv('WS_BACKPLANE_CLASS', 'core.ws.backplane.InProcessBackplane')
+WS_BACKPLANE_HUB_URL = os.getenv('WS_BACKPLANE_HUB_URL', 'tcp://127.0.0.1:8765')
+
+WS_EVENT_LOG_SIZE = 10000  # the number of last events a reconnecting client can resume from
+
 API_SPECIFICATION_PATH = os.path.join(PROJECT_ROOT, '..', 'docs', 'api.yaml')
 
 CORS_ALLOWED_METHODS = '*'
@@ -1,28 +1,67 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import typing as t
+
 import uvloop
 from motor import motor_asyncio
+from pymongo.errors import OperationFailure
 
 from aiohttp import web, WSCloseCode
 
 from conf import settings
+from core.db.counts import count_cache
+from core.db.instrumentation import query_stats
+from core.db.query_sets import write_stats
+from core.metrics import metrics
 from core.urls import setup_routes, setup_cors
+from core.utils import import_string
+from core.ws.broadcast import Broadcaster
+from core.ws.event_log import EventLog
+from core.ws.registry import ConnectionRegistry
+
+logger = logging.getLogger(__name__)
 
 
 class Application(web.Application):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
 
-        self.ws_conns = []
+        self.ws_conns = ConnectionRegistry()
+        self.ws_event_log = EventLog(size=settings.WS_EVENT_LOG_SIZE)
+        self.ws_broadcaster = Broadcaster(self.ws_conns, event_log=self.ws_event_log)
+        # payloads published with "channel" are passed to the handler of the channel
+        self.ws_backplane_handlers = {}
+        self.ws_backplane = import_string(settings.WS_BACKPLANE_CLASS)(
+            on_event=self.deliver_ws_event,
+        )
+        self.ws_reaper = None
         self.mongo_client = None
 
+        metrics.register('ws.connections', lambda: self.ws_conns.stats)
+        metrics.register('ws.backplane', lambda: self.ws_backplane.stats)
+        metrics.register('ws.event_log', lambda: self.ws_event_log.stats)
+        metrics.register('db.count_cache', lambda: count_cache.stats)
+        metrics.register('db.writes', lambda: write_stats.stats)
+        metrics.register('db.queries', lambda: query_stats.stats)
+        metrics.register('db.slow_queries', lambda: query_stats.slow_query_stats)
+
         self.setup_routes()
         self.setup_cors()
 
         self.on_startup.append(self.startup_mongodb)
+        self.on_startup.append(self.startup_mongodb_indexes)
+        self.on_startup.append(self.startup_ws_backplane)
+        self.on_startup.append(self.startup_ws_reaper)
         self.on_cleanup.append(self.cleanup_mongodb)
+        self.on_cleanup.append(self.cleanup_ws_backplane)
+        self.on_cleanup.append(self.cleanup_ws_reaper)
         self.on_cleanup.append(self.cleanup_ws_conns)
 
+        for path in settings.APP_SETUP_FUNCTIONS:
+            import_string(path)(self)
+
     def setup_routes(self) -> None:
         setup_routes(app=self, url_paths=settings.URLS)
 
@@ -33,12 +72,66 @@ class Application(web.Application):
         app.mongo_client = motor_asyncio.AsyncIOMotorClient(settings.MONGO_URL)
         app.mongo = app.mongo_client.get_database()
 
+    async def startup_mongodb_indexes(self, app: Application) -> None:
+        if not settings.ENSURE_INDEXES_ON_STARTUP:
+            return
+
+        for path in settings.INDEXED_QUERY_SET_CLASSES:
+            query_set = import_string(path)(db=app.mongo)
+
+            try:
+                built = await query_set.ensure_indexes()
+            except OperationFailure as e:
+                # e.g. the indexes can't be listed, the app still works without them
+                logger.error('Cannot build indexes of "%s": %s', query_set.collection_name, e)
+                continue
+
+            if built:
+                logger.info('Built indexes of "%s": %s', query_set.collection_name, [i.name for i in built])
+
     async def cleanup_mongodb(self, app: Application) -> None:
         app.mongo_client.close()
 
+    async def startup_ws_backplane(self, app: Application) -> None:
+        await app.ws_backplane.start()
+
+    async def cleanup_ws_backplane(self, app: Application) -> None:
+        await app.ws_backplane.stop()
+
+    def deliver_ws_event(self, message: t.Mapping[str, t.Any]) -> None:
+        payload = message['payload']
+        handler = self.ws_backplane_handlers.get(payload.get('channel'))
+
+        if handler is not None:
+            handler(payload)
+        else:
+            self.ws_broadcaster.deliver(message)
+
+    async def startup_ws_reaper(self, app: Application) -> None:
+        if settings.WS_IDLE_TIMEOUT:
+            app.ws_reaper = asyncio.ensure_future(app.reap_idle_ws_conns())
+
+    async def cleanup_ws_reaper(self, app: Application) -> None:
+        if app.ws_reaper is not None:
+            app.ws_reaper.cancel()
+
+    async def reap_idle_ws_conns(self) -> None:
+        """
+        Periodically closes connections idle for longer than WS_IDLE_TIMEOUT.
+        """
+
+        while True:
+            await asyncio.sleep(settings.WS_REAP_INTERVAL)
+
+            # a connection failing to close doesn't stop the others or the reaper
+            await asyncio.gather(*[
+                connection.close(code=WSCloseCode.GOING_AWAY, message='Idle timeout.')
+                for connection in self.ws_conns.get_idle(settings.WS_IDLE_TIMEOUT)
+            ], return_exceptions=True)
+
     async def cleanup_ws_conns(self, app: Application) -> None:
-        for ws in app.ws_conns:
-            await ws.close(
+        for connection in app.ws_conns:
+            await connection.close(
                 code=WSCloseCode.GOING_AWAY,
                 message='Server shutdown.',
             )
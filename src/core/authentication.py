@@ -45,7 +45,10 @@ class TokenAuthentication(BaseAuthentication):
 
         user_uuid = token_data['user_id']
 
-        return await UsersQS(db=request.app.mongo).get_by_uuid(user_uuid)
+        return await UsersQS(
+            db=request.app.mongo,
+            identity_map=request.get('identity_map'),
+        ).get_by_uuid(user_uuid)
 
     def validate_api_token(self, token: str) -> t.Optional[t.Dict[str, t.Any]]:
         if not token:
@@ -0,0 +1,79 @@
+import typing as t
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    In-process cache which keeps at most max_size entries, evicting
+    the least recently used one, and forgets entries older than ttl seconds.
+    An entry may be stored with a version; reading it with another
+    version is a miss, so a changed object is never served from the cache.
+    """
+
+    def __init__(self, *, max_size: int, ttl: t.Optional[float] = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: t.MutableMapping[t.Hashable, t.Tuple[t.Any, t.Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: t.Hashable, version: t.Any = None) -> t.Optional[t.Any]:
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            value, entry_version, expires_at = entry
+
+            if entry_version == version and (expires_at is None or expires_at > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def set(self, key: t.Hashable, value: t.Any, version: t.Any = None) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (value, version, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: t.Hashable) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def delete_where(self, predicate: t.Callable[[t.Any], bool]) -> None:
+        """
+        Deletes all entries which values match the predicate.
+        """
+
+        for key in [k for k, (v, _, _) in self._entries.items() if predicate(v)]:
+            self.delete(key)
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    @property
+    def stats(self) -> t.Dict[str, t.Any]:
+        requests = self.hits + self.misses
+
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / requests, 3) if requests else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
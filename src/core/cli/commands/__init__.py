@@ -1,4 +1,5 @@
 command_classes = [
+    'core.cli.commands.backplane_hub.BackplaneHubAppCommand',
     'core.cli.commands.clean_db.CleanDbAppCommand',
     'core.cli.commands.run.RunServerAppCommand',
 ]
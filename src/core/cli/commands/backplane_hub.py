@@ -0,0 +1,30 @@
+import argparse
+
+from conf import settings
+from core.cli.base import BaseAppCommand
+from core.ws.backplane import BackplaneHub
+
+
+class BackplaneHubAppCommand(BaseAppCommand):
+    """
+    The command for running of the hub which relays
+    websocket events between application workers.
+    """
+
+    name: str = 'backplane_hub'
+    help: str = (
+        'Runs the websocket backplane hub on WS_BACKPLANE_HUB_URL '
+        'from the project settings.'
+    )
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument('--url', nargs='?', type=str, default=settings.WS_BACKPLANE_HUB_URL)
+
+    async def handle(self, parsed_args: argparse.Namespace) -> None:
+        hub = BackplaneHub(url=parsed_args.url)
+        await hub.start()
+
+        try:
+            await hub.server.serve_forever()
+        finally:
+            await hub.stop()
@@ -0,0 +1,122 @@
+import abc
+import typing as t
+from collections import defaultdict
+
+from bson import json_util
+
+from conf import settings
+from core.cache import LRUCache
+
+
+class CountCache:
+    """
+    Caches numbers of documents by collection and filter. Every write
+    to a collection bumps its generation, which is the version of
+    the entries, so counts of a changed collection are never served.
+    Writes made by other workers are seen after the ttl at the latest.
+    """
+
+    def __init__(self, *, max_size: int, ttl: float) -> None:
+        self.cache = LRUCache(max_size=max_size, ttl=ttl)
+        self.generations: t.Dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def get_key(collection_name: str, where: t.Optional[t.Mapping[str, t.Any]]) -> t.Tuple[str, str]:
+        return collection_name, json_util.dumps(where or {}, sort_keys=True)
+
+    def get(self, collection_name: str, where: t.Optional[t.Mapping[str, t.Any]]) -> t.Optional[int]:
+        key = self.get_key(collection_name, where)
+        return self.cache.get(key, version=self.generations[collection_name])
+
+    def set(
+            self,
+            collection_name: str,
+            where: t.Optional[t.Mapping[str, t.Any]],
+            count: int,
+            generation: int,
+    ) -> None:
+        """
+        Stores the count made at the generation. The count of an outdated one
+        is stored as well, it's just never served.
+        """
+
+        key = self.get_key(collection_name, where)
+        self.cache.set(key, count, version=generation)
+
+    def invalidate(self, collection_name: str) -> None:
+        self.generations[collection_name] += 1
+
+    @property
+    def stats(self) -> t.Dict[str, t.Any]:
+        return self.cache.stats
+
+
+count_cache = CountCache(max_size=settings.COUNT_CACHE_SIZE, ttl=settings.COUNT_CACHE_TTL)
+
+
+class CountStrategy(abc.ABC):
+    """
+    The way paginators get the total number of objects of a query set.
+    """
+
+    @abc.abstractmethod
+    async def count(self, objects: t.Any) -> t.Optional[int]:
+        """
+        Returns the number of objects or None if it isn't known.
+        """
+
+        pass
+
+
+class ExactCount(CountStrategy):
+    """
+    Counts the matching documents on every call.
+    """
+
+    async def count(self, objects: t.Any) -> int:
+        return await objects.count()
+
+
+class EstimatedCount(CountStrategy):
+    """
+    Takes the number of documents of an unfiltered query from
+    the collection metadata instead of scanning the collection.
+    It may be off after an unclean shutdown or during chunk migrations.
+    Filtered queries are counted exactly.
+    """
+
+    async def count(self, objects: t.Any) -> int:
+        if objects.where:
+            return await objects.count()
+
+        return await objects.estimated_count()
+
+
+class CachedCount(CountStrategy):
+    """
+    Serves the count from count_cache while the collection isn't changed
+    by this worker, otherwise for COUNT_CACHE_TTL seconds at most.
+    """
+
+    def __init__(self, cache: CountCache = count_cache) -> None:
+        self.cache = cache
+
+    async def count(self, objects: t.Any) -> int:
+        count = self.cache.get(objects.collection_name, objects.where)
+
+        if count is None:
+            # a write made while counting makes this count outdated
+            generation = self.cache.generations[objects.collection_name]
+            count = await objects.count()
+            self.cache.set(objects.collection_name, objects.where, count, generation)
+
+        return count
+
+
+class NoCount(CountStrategy):
+    """
+    Doesn't count, the total isn't shown at all.
+    """
+
+    async def count(self, objects: t.Any) -> None:
+        return None
@@ -0,0 +1,138 @@
+import typing as t
+
+from core.db.models import Model
+
+Fields = t.Optional[t.FrozenSet[str]]
+
+
+class IdentityMap:
+    """
+    Keeps the models loaded during one request by their documents, so
+    a document looked up again by _id or another unique field is served
+    from memory as the same model. A model loaded with a projection only
+    serves lookups which need no other fields; fields None means all.
+
+    Query sets put models here when they read and write them.
+    Documents changed by others during the request aren't seen.
+    """
+
+    def __init__(self) -> None:
+        # (collection, _id) -> (model, fields)
+        self._documents: t.Dict[t.Tuple[str, t.Any], t.Tuple[Model, Fields]] = {}
+        # (collection, field, value) -> _id
+        self._keys: t.Dict[t.Tuple[str, str, t.Hashable], t.Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+            self,
+            collection_name: str,
+            field: str,
+            value: t.Hashable,
+            fields: t.Optional[t.Iterable[str]] = None,
+    ) -> t.Optional[Model]:
+        """
+        Returns the model whose field has the value if it has all the fields.
+        """
+
+        document_id = value if field == '_id' else self._keys.get((collection_name, field, value))
+        entry = self._documents.get((collection_name, document_id))
+
+        if entry is not None:
+            model, loaded_fields = entry
+
+            # the key may be outdated if the field was changed since
+            if getattr(model, field) == value and (
+                    loaded_fields is None
+                    or fields is not None and loaded_fields.issuperset(fields)
+            ):
+                self.hits += 1
+                return model
+
+        self.misses += 1
+        return None
+
+    def add(
+            self,
+            collection_name: str,
+            key_fields: t.Iterable[str],
+            model: Model,
+            fields: t.Optional[t.Iterable[str]] = None,
+    ) -> Model:
+        """
+        Puts the model loaded with the fields and returns the model of
+        its document, which is the already kept one unless the passed
+        model has more fields.
+        """
+
+        fields = frozenset(fields).union(['_id']) if fields is not None else None
+        key = (collection_name, model._id)
+        entry = self._documents.get(key)
+
+        if entry is not None:
+            kept_model, kept_fields = entry
+
+            if kept_fields is None or fields is not None and kept_fields.issuperset(fields):
+                return kept_model
+
+        self._documents[key] = (model, fields)
+        self.add_keys(collection_name, [f for f in key_fields if fields is None or f in fields], model)
+        return model
+
+    def add_keys(self, collection_name: str, key_fields: t.Iterable[str], model: Model) -> None:
+        """
+        Makes the model found by the current values of the fields.
+        """
+
+        for field in key_fields:
+            if field != '_id':
+                self._keys[(collection_name, field, getattr(model, field))] = model._id
+
+    def update(self, collection_name: str, key_fields: t.Iterable[str], model: Model) -> None:
+        """
+        Takes changes of the written model. Another model of
+        the same document is outdated now and is forgotten.
+        """
+
+        entry = self._documents.get((collection_name, model._id))
+
+        if entry is None:
+            return
+
+        kept_model, kept_fields = entry
+
+        if kept_model is model:
+            self.add_keys(collection_name, [f for f in key_fields if kept_fields is None or f in kept_fields], model)
+        else:
+            self.discard(collection_name, model._id)
+
+    def discard(self, collection_name: str, document_id: t.Any) -> None:
+        self._documents.pop((collection_name, document_id), None)
+
+    def find_id(self, collection_name: str, where: t.Mapping[str, t.Any]) -> t.Optional[t.Any]:
+        """
+        Returns the _id of a kept document the filter matches by one unique field.
+        """
+
+        if len(where) != 1:
+            return None
+
+        (field, value), = where.items()
+
+        if isinstance(value, dict):
+            # an operator, e.g. {'$in': [...]}
+            return None
+
+        if field == '_id':
+            return value
+
+        return self._keys.get((collection_name, field, value))
+
+    def clear(self, collection_name: t.Optional[str] = None) -> None:
+        if collection_name is None:
+            self._documents.clear()
+            self._keys.clear()
+            return
+
+        for key in [k for k in self._documents if k[0] == collection_name]:
+            del self._documents[key]
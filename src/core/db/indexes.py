@@ -0,0 +1,126 @@
+import typing as t
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+IndexInfo = t.Mapping[str, t.Any]
+
+
+class Index:
+    """
+    The declaration of an index of a query set's collection.
+    Fields are named as in sort, i.e. "-created_at" is descending.
+    A TTL index deletes documents expire_after_seconds after the date in its field.
+
+        Index('uuid', unique=True)
+        Index('room', '-created_at', '-_id')
+        Index('created_at', expire_after_seconds=24*60*60)
+
+    """
+
+    def __init__(
+            self,
+            *fields: str,
+            name: str = None,
+            unique: bool = False,
+            sparse: bool = False,
+            expire_after_seconds: int = None,
+    ) -> None:
+        if not fields:
+            raise ValueError('Index expects at least one field.')
+
+        if expire_after_seconds is not None and len(fields) > 1:
+            raise ValueError('TTL index must have a single field.')
+
+        self.keys = [
+            (field[1:], DESCENDING) if field.startswith('-') else (field, ASCENDING)
+            for field in fields
+        ]
+        self.name = name or '_'.join(f'{field}_{direction}' for field, direction in self.keys)
+        self.unique = unique
+        self.sparse = sparse
+        self.expire_after_seconds = expire_after_seconds
+
+    def __repr__(self) -> str:
+        return f'<Index {self.name}>'
+
+    @property
+    def options(self) -> t.Dict[str, t.Any]:
+        """
+        The options as index_information reports them.
+        """
+
+        options = {}
+
+        if self.unique:
+            options['unique'] = True
+
+        if self.sparse:
+            options['sparse'] = True
+
+        if self.expire_after_seconds is not None:
+            options['expireAfterSeconds'] = self.expire_after_seconds
+
+        return options
+
+    def as_model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+    def has_keys(self, info: IndexInfo) -> bool:
+        # directions may come as floats, special indexes have names instead, e.g. "text"
+        keys = [
+            (field, direction if isinstance(direction, str) else int(direction))
+            for field, direction in info['key']
+        ]
+        return keys == self.keys
+
+    def has_options(self, info: IndexInfo) -> bool:
+        options = {option: True for option in ('unique', 'sparse') if info.get(option)}
+
+        # 0 is a valid TTL, the documents expire at the date itself
+        if 'expireAfterSeconds' in info:
+            options['expireAfterSeconds'] = int(info['expireAfterSeconds'])
+
+        return options == self.options
+
+
+class IndexDiff:
+    """
+    The difference between declared and existing indexes of a collection.
+    """
+
+    def __init__(self) -> None:
+        self.existing: t.List[Index] = []
+        self.missing: t.List[Index] = []
+        # declared indexes which exist with other options, under the existing names
+        self.changed: t.Dict[str, Index] = {}
+        # names of existing indexes which aren't declared
+        self.extra: t.List[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.missing or self.changed or self.extra)
+
+
+def diff_indexes(declared: t.Sequence[Index], existing: t.Mapping[str, IndexInfo]) -> IndexDiff:
+    """
+    Compares the declared indexes with the existing ones
+    which are passed as returned by index_information.
+    Indexes are matched by their keys, so the names don't matter.
+    """
+
+    diff = IndexDiff()
+    matched = {'_id_'}
+
+    for index in declared:
+        name = next((n for n, info in existing.items() if index.has_keys(info)), None)
+
+        if name is None:
+            diff.missing.append(index)
+        elif index.has_options(existing[name]):
+            diff.existing.append(index)
+        else:
+            diff.changed[name] = index
+
+        matched.add(name)
+
+    diff.extra = [name for name in existing if name not in matched]
+    return diff
@@ -0,0 +1,257 @@
+import asyncio
+import bisect
+import logging
+import time
+import typing as t
+from collections import deque
+
+from conf import settings
+
+logger = logging.getLogger(__name__)
+
+ExplainFunc = t.Callable[[], t.Awaitable[t.Mapping[str, t.Any]]]
+
+# upper bounds of the latency buckets in milliseconds
+LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def get_filter_shape(value: t.Any) -> t.Any:
+    """
+    Replaces the values of a filter with "?" keeping field names and
+    operators, so filters of the same query look the same and no
+    user data gets to logs: {'room': {'$in': ['?']}}.
+    """
+
+    if isinstance(value, dict):
+        return {k: get_filter_shape(v) for k, v in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        shapes = []
+
+        for item in value:
+            shape = get_filter_shape(item)
+
+            if shape not in shapes:
+                shapes.append(shape)
+
+        return shapes
+
+    return '?'
+
+
+def get_plan_summary(explain: t.Mapping[str, t.Any]) -> t.Dict[str, t.Any]:
+    """
+    Extracts the stages of the winning plan, e.g. "FETCH < IXSCAN uuid_1",
+    and the examined numbers from explain output.
+    """
+
+    stages = []
+    stage = explain.get('queryPlanner', {}).get('winningPlan', {})
+
+    while stage:
+        name = stage.get('stage', '?')
+
+        if stage.get('indexName'):
+            name = f'{name} {stage["indexName"]}'
+
+        stages.append(name)
+        stage = stage.get('inputStage') or (stage.get('inputStages') or [None])[0]
+
+    execution_stats = explain.get('executionStats', {})
+
+    return {
+        'plan': ' < '.join(stages),
+        'docs_examined': execution_stats.get('totalDocsExamined'),
+        'keys_examined': execution_stats.get('totalKeysExamined'),
+        'returned': execution_stats.get('nReturned'),
+    }
+
+
+class Histogram:
+    """
+    Counts durations by LATENCY_BUCKETS, the last bucket is unbounded.
+    """
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration_ms: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, duration_ms)] += 1
+        self.count += 1
+        self.total += duration_ms
+        self.max = max(self.max, duration_ms)
+
+    def percentile(self, q: float) -> t.Optional[float]:
+        """
+        Returns the upper bound of the bucket the q-th percentile falls in.
+        """
+
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+
+            if seen >= rank:
+                return bound
+
+        return self.max
+
+    @property
+    def stats(self) -> t.Dict[str, t.Any]:
+        buckets = {f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS, self.counts)}
+        buckets['inf'] = self.counts[-1]
+
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3) if self.count else None,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max, 3),
+            'buckets': buckets,
+        }
+
+
+class QueryMeasurement:
+    """
+    The context manager timing one database operation.
+    """
+
+    __slots__ = ('stats', 'collection_name', 'operation', 'where', 'explain', 'started_at')
+
+    def __init__(
+            self,
+            stats: 'QueryStats',
+            collection_name: str,
+            operation: str,
+            where: t.Optional[t.Mapping[str, t.Any]],
+            explain: t.Optional[ExplainFunc],
+    ) -> None:
+        self.stats = stats
+        self.collection_name = collection_name
+        self.operation = operation
+        self.where = where
+        self.explain = explain
+
+    def __enter__(self) -> 'QueryMeasurement':
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: t.Any) -> None:
+        duration_ms = (time.perf_counter() - self.started_at) * 1000
+        self.stats.record(self.collection_name, self.operation, duration_ms, self.where, self.explain)
+
+
+class QueryStats:
+    """
+    Collects latency histograms of database operations by collection
+    and operation, and keeps the last slow queries: the ones which took
+    longer than slow_query_ms. The plans of slow queries are taken with
+    explain in background if explain_slow_queries is on.
+    """
+
+    def __init__(self, *, slow_query_ms: float, slow_query_log_size: int, explain_slow_queries: bool) -> None:
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow_queries = explain_slow_queries
+        self.histograms: t.Dict[t.Tuple[str, str], Histogram] = {}
+        self.slow_queries: t.Deque[t.Dict[str, t.Any]] = deque(maxlen=slow_query_log_size)
+        # running explain tasks are referenced, so they aren't garbage collected
+        self._explain_tasks: t.Set[asyncio.Future] = set()
+
+    def measure(
+            self,
+            collection_name: str,
+            operation: str,
+            where: t.Optional[t.Mapping[str, t.Any]] = None,
+            explain: t.Optional[ExplainFunc] = None,
+    ) -> QueryMeasurement:
+        """
+        Returns the context manager to wrap an operation with. explain
+        returns the explain output of the operation's query if it has one.
+        """
+
+        return QueryMeasurement(self, collection_name, operation, where, explain)
+
+    def record(
+            self,
+            collection_name: str,
+            operation: str,
+            duration_ms: float,
+            where: t.Optional[t.Mapping[str, t.Any]] = None,
+            explain: t.Optional[ExplainFunc] = None,
+    ) -> None:
+        key = (collection_name, operation)
+        histogram = self.histograms.get(key)
+
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+
+        histogram.add(duration_ms)
+
+        if duration_ms >= self.slow_query_ms:
+            self.record_slow_query(collection_name, operation, duration_ms, where, explain)
+
+    def record_slow_query(
+            self,
+            collection_name: str,
+            operation: str,
+            duration_ms: float,
+            where: t.Optional[t.Mapping[str, t.Any]],
+            explain: t.Optional[ExplainFunc],
+    ) -> None:
+        entry = {
+            'collection': collection_name,
+            'operation': operation,
+            'filter': get_filter_shape(where) if where is not None else None,
+            'duration_ms': round(duration_ms, 3),
+        }
+        self.slow_queries.append(entry)
+        logger.warning(
+            'Slow %s on "%s" took %.1f ms, filter %s.',
+            operation, collection_name, duration_ms, entry['filter'],
+        )
+
+        if self.explain_slow_queries and explain is not None:
+            task = asyncio.ensure_future(self.capture_explain(entry, explain))
+            self._explain_tasks.add(task)
+            task.add_done_callback(self._explain_tasks.discard)
+
+    async def capture_explain(self, entry: t.Dict[str, t.Any], explain: ExplainFunc) -> None:
+        try:
+            entry['explain'] = get_plan_summary(await explain())
+        except Exception as e:
+            logger.warning('Cannot explain the slow %s on "%s": %s', entry['operation'], entry['collection'], e)
+            return
+
+        logger.warning(
+            'Plan of the slow %s on "%s": %s.',
+            entry['operation'], entry['collection'], entry['explain'],
+        )
+
+    @property
+    def stats(self) -> t.Dict[str, t.Any]:
+        return {
+            f'{collection_name}.{operation}': histogram.stats
+            for (collection_name, operation), histogram in sorted(self.histograms.items())
+        }
+
+    @property
+    def slow_query_stats(self) -> t.Dict[str, t.Any]:
+        return {
+            'threshold_ms': self.slow_query_ms,
+            'recent': list(self.slow_queries),
+        }
+
+
+query_stats = QueryStats(
+    slow_query_ms=settings.DB_SLOW_QUERY_MS,
+    slow_query_log_size=settings.DB_SLOW_QUERY_LOG_SIZE,
+    explain_slow_queries=settings.DB_EXPLAIN_SLOW_QUERIES,
+)
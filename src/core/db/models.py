@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import typing as t
+from datetime import datetime
 from uuid import UUID
 
+# marks a value which wasn't loaded from a database and whose default
+# is computed on first access (e.g. uuid4 or datetime.now)
+_MISSING = object()
+
 
 class Field:
     """
     The descriptor for using in Model classes.
     The descriptor takes different parameters for initialization and
     validation of certain arguments passed to Model class.
+    Values are kept in the _values list of a model by the field index.
     """
 
     def __init__(
@@ -19,21 +25,48 @@ class Field:
         self.default = default
         self.is_required = is_required
         self.name = None
+        self.index = None
 
     def __set_name__(self, owner: 'Model', name: str) -> None:
         self.name = name
 
-    def __get__(self, instance: Field, owner: 'Model') -> t.Any:
-        return instance.__dict__.get(self.name, self.get_default())
+    def __get__(self, instance: 'Model', owner: t.Type['Model']) -> t.Any:
+        if instance is None:
+            return self
+
+        value = instance._values[self.index]
+
+        if value is _MISSING:
+            value = self.get_default()
+            instance._values[self.index] = value
+
+        return value
+
+    def __set__(self, instance: 'Model', value: t.Any) -> None:
+        value = self.clean(value)
+        values = instance._values
+
+        if values[self.index] is not _MISSING and values[self.index] == value:
+            return
 
-    def __set__(self, instance: Field, value: t.Any) -> None:
-        if not value and self.is_required and not self.get_default():
-            raise ValueError(f'{self.name} is required')
+        values[self.index] = value
+        instance._mark_changed(self.name)
 
-        value = self.get_default() if value is None else value
-        value = self.prepare_value(value)
+    def clean(self, value: t.Any) -> t.Any:
+        """
+        Validates a value, replaces an empty one with the default and prepares it.
+        """
+
+        if not value:
+            default = self.get_default()
+
+            if self.is_required and not default:
+                raise ValueError(f'{self.name} is required')
 
-        instance.__dict__[self.name] = value
+            if value is None:
+                value = default
+
+        return self.prepare_value(value)
 
     def prepare_value(self, value: t.Any) -> t.Any:
         """
@@ -49,12 +82,37 @@ class Field:
             return self.default
         return None
 
+    @property
+    def db_default(self) -> t.Any:
+        """
+        The value for a field missing in a stored document. Static
+        defaults are used as is, callable ones are deferred to access.
+        """
+
+        return _MISSING if callable(self.default) else self.default
+
 
 class UUIDField(Field):
     def prepare_value(self, value: t.Union[str, UUID]) -> str:
         return str(value)
 
 
+class DateTimeField(Field):
+    def prepare_value(self, value: t.Optional[datetime]) -> t.Optional[datetime]:
+        """
+        Truncates microseconds to milliseconds as BSON stores them,
+        so a model equals its document without reading it back.
+        """
+
+        if value is None:
+            return value
+
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+    def get_default(self) -> t.Any:
+        return self.prepare_value(super().get_default())
+
+
 class ModelMetaclass(type):
     @classmethod
     def get_fields(mcs, attrs: t.Mapping[str, t.Any]) -> t.Dict[str, Field]:
@@ -74,8 +132,26 @@ class ModelMetaclass(type):
             bases: t.Tuple[t.Type, ...],
             attrs: t.Dict[str, t.Any],
     ) -> type:
+        # values live in the _values slot of the base model
+        attrs.setdefault('__slots__', ())
         cls = super().__new__(mcs, name, bases, attrs)
-        cls.fields_map = mcs.get_fields(attrs)
+        fields_map = {}
+
+        for base in reversed(bases):
+            fields_map.update(getattr(base, 'fields_map', {}))
+
+        fields_map.update(mcs.get_fields(attrs))
+
+        for index, field in enumerate(fields_map.values()):
+            field.index = index
+
+        cls.fields_map = fields_map
+        cls._field_names = tuple(fields_map)
+        cls._db_defaults = tuple(
+            (field.index, field.db_default)
+            for field in fields_map.values()
+            if field.db_default is not None
+        )
         return cls
 
 
@@ -84,15 +160,75 @@ class Model(metaclass=ModelMetaclass):
     The model class for storing different values.
     """
 
+    # _changed holds names of fields assigned since the model was loaded
+    # or saved, it's set on the first change only
+    __slots__ = ('_values', '_changed')
+
     def __init__(self, **kw) -> None:
-        for field_name in self.fields_map.keys():
-            field_value = kw.get(field_name, None)
-            setattr(self, field_name, field_value)
+        self._values = [field.clean(kw.get(name)) for name, field in self.fields_map.items()]
+
+    def _mark_changed(self, name: str) -> None:
+        try:
+            self._changed.add(name)
+        except AttributeError:
+            self._changed = {name}
+
+    @property
+    def changed_fields(self) -> t.FrozenSet[str]:
+        return frozenset(getattr(self, '_changed', ()))
+
+    def get_changes(self) -> t.Dict[str, t.Any]:
+        """
+        Returns the values of changed fields by their names.
+        """
+
+        return {name: getattr(self, name) for name in getattr(self, '_changed', ())}
+
+    def mark_clean(self) -> None:
+        """
+        Forgets the changes, e.g. after they are saved.
+        """
+
+        if hasattr(self, '_changed'):
+            del self._changed
+
+    def set_values(self, data: t.Mapping[str, t.Any]) -> None:
+        """
+        Assigns the values to the fields with the same names, unknown names are ignored.
+        Only values which differ from the current ones mark fields as changed.
+        """
+
+        for name, value in data.items():
+            if name in self.fields_map:
+                setattr(self, name, value)
+
+    @classmethod
+    def from_db(cls, data: t.Mapping[str, t.Any]) -> Model:
+        """
+        Creates a model from a trusted stored document skipping validation,
+        so a document fetched with a projection can be loaded too.
+        Missing and null fields get their defaults.
+        """
+
+        obj = object.__new__(cls)
+        obj._values = values = list(map(data.get, cls._field_names))
+
+        for index, default in cls._db_defaults:
+            if values[index] is None:
+                values[index] = default
+
+        return obj
 
     @property
     def as_dict(self) -> t.Dict[str, t.Any]:
         """
-        Collects field values, transforms it to dict and returns.
+        Returns field values as dict in the order of fields. Fields which
+        weren't loaded from a database and have callable defaults are left out.
         """
 
-        return {k: getattr(self, k, None) for k in self.fields_map.keys()}
+        values = self._values
+
+        if _MISSING in values:
+            return {k: v for k, v in zip(self._field_names, values) if v is not _MISSING}
+
+        return dict(zip(self._field_names, values))
@@ -2,12 +2,52 @@ from __future__ import annotations
 
 import typing as t
 import abc
+import enum
+import logging
 
 from motor import motor_asyncio
-from pymongo import ReturnDocument
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
 
+from core.db.counts import count_cache
+from core.db.identity_map import IdentityMap
+from core.db.indexes import Index, IndexDiff, diff_indexes
+from core.db.instrumentation import ExplainFunc, QueryMeasurement, query_stats
 from core.db.models import Model
 
+logger = logging.getLogger(__name__)
+
+
+class WriteStats:
+    """
+    Counts database round trips which writes didn't need.
+    """
+
+    def __init__(self) -> None:
+        self.read_backs_avoided = 0
+        self.noop_updates_skipped = 0
+
+    @property
+    def stats(self) -> t.Dict[str, int]:
+        return {
+            'avoided_round_trips': self.read_backs_avoided + self.noop_updates_skipped,
+            'read_backs_avoided': self.read_backs_avoided,
+            'noop_updates_skipped': self.noop_updates_skipped,
+        }
+
+
+write_stats = WriteStats()
+
+
+class SaveResult(enum.Enum):
+    """
+    What save did with a model.
+    """
+
+    UNCHANGED = 'unchanged'  # the model has no changes, nothing is written
+    NOT_FOUND = 'not_found'  # no document matches the filter
+    SAVED = 'saved'
+
 
 class QuerySet:
     """
@@ -16,8 +56,16 @@ class QuerySet:
 
     model_class = None
 
-    def __init__(self, *, db: motor_asyncio.AsyncIOMotorDatabase) -> None:
+    def __init__(
+            self,
+            *,
+            db: motor_asyncio.AsyncIOMotorDatabase,
+            projection: t.Optional[t.Iterable[str]] = None,
+            identity_map: t.Optional[IdentityMap] = None,
+    ) -> None:
         self.db = db
+        self.projection = projection
+        self.identity_map = identity_map
 
     @abc.abstractmethod
     def __await__(self):
@@ -39,6 +87,14 @@ class QuerySet:
 
         pass
 
+    @abc.abstractmethod
+    async def get_many(self, field, values):
+        """
+        Returns objects by values of a field.
+        """
+
+        pass
+
     @abc.abstractmethod
     async def filter(self, **kwargs):
         """
@@ -64,7 +120,7 @@ class QuerySet:
         pass
 
     @abc.abstractmethod
-    async def insert_many(self, models):
+    async def insert_many(self, models, ordered=True):
         """
         Inserts many objects to database.
         """
@@ -79,6 +135,14 @@ class QuerySet:
 
         pass
 
+    @abc.abstractmethod
+    async def save(self, model, where=None):
+        """
+        Writes the changes of a loaded object and returns SaveResult.
+        """
+
+        pass
+
     @abc.abstractmethod
     async def count(self, **kw):
         """
@@ -91,20 +155,68 @@ class QuerySet:
 class MongoDBQuerySet(QuerySet):
     """
     Implements the query set for mongo database.
+    The cursor is created on first use, so filter, only, sort, hint,
+    offset, limit and batch_size may be chained in any order.
     """
 
     collection_name = None
+    default_batch_size: t.Optional[int] = None
+    default_chunk_size: int = 100
+    # the indexes the queries rely on, see ensure_indexes
+    indexes: t.List[Index] = []
 
     def __init__(self, **kw) -> None:
         super().__init__(**kw)
-        self.cursor = None
+        self.where = None
+        self.fields = None
+        self._cursor = None
+        self._sort = None
+        self._hint = None
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = self.default_batch_size
 
     def __await__(self) -> t.Generator[t.Any, None, t.Any]:
         return self._fetch_all().__await__()
 
+    async def __aiter__(self) -> t.AsyncIterator[Model]:
+        """
+        Iterates models lazily by chunks, see chunks,
+        so every round trip of the cursor is measured.
+        """
+
+        async for chunk in self.chunks():
+            for model in chunk:
+                yield model
+
     async def _fetch_all(self, length: int = None) -> t.List[t.Type[Model]]:
-        objs = await self.cursor.to_list(length=length)
-        return list(map(lambda i: self.model_class(**i), objs))
+        with self.measure('find', self.where, explain=self.explain):
+            objs = await self.cursor.to_list(length=length)
+
+        return [self.model_class.from_db(i) for i in objs]
+
+    @property
+    def cursor(self) -> motor_asyncio.AsyncIOMotorCursor:
+        if self._cursor is None:
+            cursor = self.collection.find(
+                self.where or {},
+                projection=self.get_projection(self.fields),
+                skip=self._skip,
+                limit=self._limit,
+            )
+
+            if self._sort:
+                cursor = cursor.sort(self._sort)
+
+            if self._hint:
+                cursor = cursor.hint(self._hint)
+
+            if self._batch_size:
+                cursor = cursor.batch_size(self._batch_size)
+
+            self._cursor = cursor
+
+        return self._cursor
 
     @property
     def collection(self) -> motor_asyncio.AsyncIOMotorCollection:
@@ -114,13 +226,84 @@ class MongoDBQuerySet(QuerySet):
 
         return self.db[self.collection_name]
 
-    def all(self) -> MongoDBQuerySet:
+    def measure(
+            self,
+            operation: str,
+            where: t.Optional[t.Mapping[str, t.Any]] = None,
+            explain: t.Optional[ExplainFunc] = None,
+    ) -> QueryMeasurement:
+        """
+        Times an operation on the collection, see core.db.instrumentation.
+        """
+
+        return query_stats.measure(self.collection_name, operation, where, explain)
+
+    async def explain(self) -> t.Mapping[str, t.Any]:
+        """
+        Explains how the query of the query set is executed.
+        """
+
+        return await self.cursor.explain()
+
+    def get_explain_func(self, where: t.Optional[t.Mapping[str, t.Any]]) -> ExplainFunc:
+        """
+        Returns the function explaining how documents matching the filter are found.
+        """
+
+        return lambda: self.collection.find(where or {}).explain()
+
+    async def diff_indexes(self) -> IndexDiff:
+        """
+        Compares the declared indexes with the ones existing in the collection.
+        """
+
+        return diff_indexes(self.indexes, await self.collection.index_information())
+
+    async def ensure_indexes(self, diff: IndexDiff = None) -> t.List[Index]:
+        """
+        Builds the declared indexes which don't exist yet and returns the built ones.
+        Indexes are built one by one, so an index which can't be built,
+        e.g. a unique one over duplicates, is logged and doesn't prevent others.
+        Existing indexes are never changed or dropped.
+        """
+
+        diff = diff or await self.diff_indexes()
+        built = []
+
+        for index in diff.missing:
+            try:
+                await self.collection.create_indexes([index.as_model()])
+            except OperationFailure as e:
+                logger.error('Cannot build index %s of "%s": %s', index.name, self.collection_name, e)
+                continue
+
+            built.append(index)
+
+        return built
+
+    def get_projection(
+            self,
+            projection: t.Optional[t.Iterable[str]] = None,
+    ) -> t.Optional[t.Dict[str, bool]]:
+        """
+        Returns the projection for a query: the passed fields,
+        otherwise the ones the query set was created with.
+        None means whole documents.
+        """
+
+        projection = projection if projection is not None else self.projection
+
+        if projection is None:
+            return None
+
+        return {field: True for field in projection}
+
+    def all(self, projection: t.Optional[t.Iterable[str]] = None) -> MongoDBQuerySet:
         """
         Returns all objects from collection.
         """
 
-        self.cursor = self.collection.find()
-        return self
+        return self.filter(where={}, projection=projection)
 
     async def count(
             self, *,
@@ -129,7 +312,8 @@ class MongoDBQuerySet(QuerySet):
             offset: int = None,
     ) -> int:
         """
-        Returns number of documents in a collection.
+        Returns number of documents matching the filter,
+        the one of the query set by default.
         """
 
         extra = {}
@@ -138,54 +322,273 @@ class MongoDBQuerySet(QuerySet):
             extra['limit'] = limit
 
         if offset:
-            extra['offset'] = offset
+            extra['skip'] = offset
 
-        return await self.collection.count_documents(filter=where or {}, **extra)
+        where = where if where is not None else self.where
 
-    async def get_one(self, where: t.Mapping[str, t.Any]) -> t.Optional[Model]:
+        with self.measure('count_documents', where or {}, explain=self.get_explain_func(where)):
+            return await self.collection.count_documents(filter=where or {}, **extra)
+
+    async def estimated_count(self) -> int:
+        """
+        Returns number of all documents in a collection taken from its metadata.
+        """
+
+        with self.measure('estimated_document_count'):
+            return await self.collection.estimated_document_count()
+
+    @property
+    def key_fields(self) -> t.List[str]:
+        """
+        The fields identifying documents: _id and the ones with unique indexes.
+        """
+
+        return ['_id'] + [
+            index.keys[0][0] for index in self.indexes
+            if index.unique and len(index.keys) == 1
+        ]
+
+    def _remember(self, model: Model, projection: t.Optional[t.Iterable[str]]) -> Model:
+        """
+        Puts a loaded model to the identity map and returns the model of its document.
+        """
+
+        if self.identity_map is None:
+            return model
+
+        return self.identity_map.add(self.collection_name, self.key_fields, model, projection)
+
+    async def get_one(
+            self,
+            where: t.Mapping[str, t.Any],
+            projection: t.Optional[t.Iterable[str]] = None,
+    ) -> t.Optional[Model]:
         """
         Finds an one document in a collection by passed filter and return it as model.
+        A document looked up by a key field is taken from the identity map if it's there.
         """
 
-        data = await self.collection.find_one(where)
-        return self.model_class(**data) if data else None
+        projection = projection if projection is not None else self.projection
+
+        if self.identity_map is not None and len(where) == 1:
+            (field, value), = where.items()
 
-    def filter(self, where: t.Mapping[str, t.Any]) -> MongoDBQuerySet:
+            if field in self.key_fields and not isinstance(value, dict):
+                model = self.identity_map.get(self.collection_name, field, value, projection)
+
+                if model is not None:
+                    return model
+
+        with self.measure('find_one', where, explain=self.get_explain_func(where)):
+            data = await self.collection.find_one(where, projection=self.get_projection(projection))
+
+        return self._remember(self.model_class.from_db(data), projection) if data else None
+
+    async def get_many(
+            self,
+            field: str,
+            values: t.Iterable[t.Hashable],
+            projection: t.Optional[t.Iterable[str]] = None,
+    ) -> t.Dict[t.Hashable, Model]:
+        """
+        Finds documents by values of the field with one query and returns
+        the models by the values. Documents looked up by a key field
+        are taken from the identity map if they are there.
+        """
+
+        projection = projection if projection is not None else self.projection
+        values = list(values)
+        models = {}
+
+        if self.identity_map is not None and field in self.key_fields:
+            for value in values:
+                model = self.identity_map.get(self.collection_name, field, value, projection)
+
+                if model is not None:
+                    models[value] = model
+
+            values = [value for value in values if value not in models]
+
+        if values:
+            for model in await self.filter(where={field: {'$in': list(values)}}, projection=projection):
+                model = self._remember(model, projection)
+                models[getattr(model, field)] = model
+
+        return models
+
+    def filter(
+            self,
+            where: t.Mapping[str, t.Any],
+            projection: t.Optional[t.Iterable[str]] = None,
+    ) -> MongoDBQuerySet:
         """
         Finds documents in a collection by passed
         filter and return them as models.
         """
 
-        self.cursor = self.collection.find(where)
+        self.where = where
+
+        if projection is not None:
+            self.fields = projection
+
+        self._cursor = None
+        return self
+
+    def only(self, *fields: str) -> MongoDBQuerySet:
+        """
+        Fetches only the passed fields of documents.
+        """
+
+        self.fields = fields
+        self._cursor = None
+        return self
+
+    def sort(self, *fields: str) -> MongoDBQuerySet:
+        """
+        Sorts documents by the fields, descending
+        if a name starts with "-", e.g. sort('-created_at', '_id').
+        """
+
+        self._sort = [
+            (field[1:], DESCENDING) if field.startswith('-') else (field, ASCENDING)
+            for field in fields
+        ]
+        self._cursor = None
+        return self
+
+    def hint(self, index: t.Union[str, t.Sequence[t.Tuple[str, int]]]) -> MongoDBQuerySet:
+        """
+        Forces the query to use the index, passed by name or by its keys.
+        """
+
+        self._hint = index
+        self._cursor = None
+        return self
+
+    def batch_size(self, size: int) -> MongoDBQuerySet:
+        """
+        Sets the number of documents the driver fetches per round trip.
+        """
+
+        self._batch_size = size
+        self._cursor = None
         return self
 
     async def update_one(
             self,
             where: t.Mapping[str, t.Any],
             data: t.Mapping[str, t.Any],
+            increment: t.Mapping[str, t.Union[int, float]] = None,
     ) -> t.Optional[t.Type[Model]]:
         """
         Updates a one document in a collection
         and returns it as model if it exists.
+        Fields in increment are incremented by their values.
         """
 
-        data = await self.collection.find_one_and_update(
-            filter=where,
-            update={'$set': data},
-            return_document=ReturnDocument.AFTER,
-        )
-        return self.model_class(**data) if data else None
+        update = {'$set': data}
+
+        if increment:
+            update['$inc'] = increment
+
+        with self.measure('find_one_and_update', where, explain=self.get_explain_func(where)):
+            data = await self.collection.find_one_and_update(
+                filter=where,
+                update=update,
+                return_document=ReturnDocument.AFTER,
+            )
+
+        if not data:
+            return None
+
+        # the document may stop or start matching counted filters
+        count_cache.invalidate(self.collection_name)
+        model = self.model_class.from_db(data)
+
+        if self.identity_map is not None:
+            self.identity_map.discard(self.collection_name, model._id)
+            model = self._remember(model, None)
+
+        return model
+
+    async def save(
+            self,
+            model: Model,
+            where: t.Optional[t.Mapping[str, t.Any]] = None,
+            increment: t.Mapping[str, t.Union[int, float]] = None,
+    ) -> SaveResult:
+        """
+        Writes the changed fields of a loaded model with a minimal $set,
+        the document is found by where or by the model's _id.
+        Fields in increment are incremented in the document and their
+        new values are read back with the same write, so concurrent
+        saves never get the same ones. A model without changes isn't
+        written at all, a model whose document isn't found stays changed.
+        """
+
+        changes = model.get_changes()
+
+        if not changes:
+            write_stats.noop_updates_skipped += 1
+            return SaveResult.UNCHANGED
+
+        where = where if where is not None else {'_id': model._id}
+
+        if increment:
+            with self.measure('find_one_and_update', where, explain=self.get_explain_func(where)):
+                data = await self.collection.find_one_and_update(
+                    filter=where,
+                    update={'$set': changes, '$inc': increment},
+                    projection={name: True for name in increment},
+                    return_document=ReturnDocument.AFTER,
+                )
+
+            if data is None:
+                return SaveResult.NOT_FOUND
+
+            for name in increment:
+                model._values[model.fields_map[name].index] = data[name]
+        else:
+            with self.measure('update_one', where, explain=self.get_explain_func(where)):
+                result = await self.collection.update_one(filter=where, update={'$set': changes})
+
+            if not result.matched_count:
+                return SaveResult.NOT_FOUND
+
+        model.mark_clean()
+        count_cache.invalidate(self.collection_name)
+
+        if self.identity_map is not None:
+            self.identity_map.update(self.collection_name, self.key_fields, model)
+
+        return SaveResult.SAVED
 
     async def delete_one(self, where: t.Mapping[str, t.Any]):
         """
         Deletes a one document in a collection found with filters.
         """
 
-        return await self.collection.delete_one(where)
+        with self.measure('delete_one', where, explain=self.get_explain_func(where)):
+            result = await self.collection.delete_one(where)
+
+        if result.deleted_count:
+            count_cache.invalidate(self.collection_name)
+
+            if self.identity_map is not None:
+                document_id = self.identity_map.find_id(self.collection_name, where)
+
+                if document_id is not None:
+                    self.identity_map.discard(self.collection_name, document_id)
+                else:
+                    self.identity_map.clear(self.collection_name)
+
+        return result
 
     async def insert_one(self, model: Model) -> Model:
         """
-        Inserts a one document in a collection and returns it as model.
+        Inserts a one document in a collection and returns the model
+        with the generated _id. The document is the model's data,
+        so it isn't read back.
         """
 
         if not isinstance(model, Model):
@@ -196,12 +599,23 @@ class MongoDBQuerySet(QuerySet):
         if not model_as_dict.get('_id'):
             model_as_dict.pop('_id')
 
-        result = await self.collection.insert_one(model_as_dict)
-        return await self.get_one(where={'_id': result.inserted_id})
+        with self.measure('insert_one'):
+            result = await self.collection.insert_one(model_as_dict)
+        count_cache.invalidate(self.collection_name)
 
-    async def insert_many(self, models: t.Sequence[Model]):
+        if '_id' in model.fields_map:
+            model._id = result.inserted_id
+            model.mark_clean()
+            self._remember(model, None)
+
+        write_stats.read_backs_avoided += 1
+        return model
+
+    async def insert_many(self, models: t.Sequence[Model], ordered: bool = True) -> t.Dict[int, str]:
         """
-        Inserts many documents in a collection and returns them as models.
+        Inserts many documents in a collection with one bulk write.
+        Unordered writes go on after a failed document. Returns
+        the errors of documents which weren't inserted by their indexes.
         """
 
         for model in models:
@@ -218,22 +632,57 @@ class MongoDBQuerySet(QuerySet):
 
             data.append(model_as_dict)
 
-        return await self.collection.insert_many(data)
+        try:
+            with self.measure('insert_many'):
+                await self.collection.insert_many(data, ordered=ordered)
+        except BulkWriteError as e:
+            errors = {error['index']: error['errmsg'] for error in e.details['writeErrors']}
+
+            if ordered:
+                # the documents after the failed one weren't even tried
+                errors.update((i, 'Not inserted.') for i in range(min(errors) + 1, len(data)))
+
+            return errors
+        finally:
+            count_cache.invalidate(self.collection_name)
+
+        return {}
+
+    async def chunks(self, size: int = None) -> t.AsyncIterator[t.List[Model]]:
+        """
+        Iterates the cursor yielding lists of at most size models,
+        so only one chunk of documents is kept in memory at once.
+        Unless set otherwise, the driver fetches a chunk per round trip.
+        """
+
+        size = size or self._batch_size or self.default_chunk_size
+
+        if self._batch_size is None and self._cursor is None:
+            self._batch_size = size
+
+        while True:
+            with self.measure('find', self.where, explain=self.explain):
+                objs = await self.cursor.to_list(length=size)
+
+            if not objs:
+                return
+
+            yield [self.model_class.from_db(i) for i in objs]
 
     def offset(self, offset: int) -> MongoDBQuerySet:
         """
-        Moves the mongodb cursor to defined offset value.
+        Skips the defined number of documents.
         """
 
-        self.cursor = self.cursor.skip(offset)
+        self._skip = offset
+        self._cursor = None
         return self
 
     def limit(self, limit: int) -> MongoDBQuerySet:
         """
-        Limits the documents in the cursor to defined limit value.
+        Limits the documents to defined limit value.
         """
 
-        self.cursor = self.cursor.limit(limit)
+        self._limit = limit
+        self._cursor = None
         return self
-
-
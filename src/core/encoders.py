@@ -0,0 +1,92 @@
+import typing as t
+import json
+from datetime import date, datetime
+from uuid import UUID
+
+from bson import ObjectId
+
+from conf import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_default(obj: t.Any) -> t.Any:
+    """
+    Converts values which JSON has no type for. Shared by every backend,
+    so serializers can leave datetimes, UUIDs and ObjectIds as they are.
+    """
+
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+
+    if isinstance(obj, (UUID, ObjectId)):
+        return str(obj)
+
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class StdlibJSONEncoder:
+    """
+    Encodes with the json module of the standard library.
+    """
+
+    name = 'stdlib'
+
+    def __init__(self) -> None:
+        self._encoder = json.JSONEncoder(default=encode_default, separators=(',', ':'))
+
+    def dumps(self, obj: t.Any) -> str:
+        return self._encoder.encode(obj)
+
+    def dumps_bytes(self, obj: t.Any) -> bytes:
+        return self._encoder.encode(obj).encode('utf-8')
+
+    def loads(self, data: t.Union[str, bytes]) -> t.Any:
+        return json.loads(data)
+
+
+class OrjsonEncoder:
+    """
+    Encodes with orjson which handles datetimes and UUIDs natively.
+    Available only if the orjson package is installed.
+    """
+
+    name = 'orjson'
+
+    def dumps(self, obj: t.Any) -> str:
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj: t.Any) -> bytes:
+        return orjson.dumps(obj, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: t.Union[str, bytes]) -> t.Any:
+        return orjson.loads(data)
+
+
+JSONEncoder = t.Union[StdlibJSONEncoder, OrjsonEncoder]
+
+encoders: t.Dict[str, JSONEncoder] = {StdlibJSONEncoder.name: StdlibJSONEncoder()}
+
+if orjson is not None:
+    encoders[OrjsonEncoder.name] = OrjsonEncoder()
+
+
+def get_encoder(name: str) -> JSONEncoder:
+    """
+    Returns the encoder by its name. "auto" picks
+    the fastest installed one.
+    """
+
+    if name == 'auto':
+        return encoders.get(OrjsonEncoder.name, encoders[StdlibJSONEncoder.name])
+
+    try:
+        return encoders[name]
+    except KeyError:
+        raise ImportError(f'JSON encoder "{name}" is unknown or its package is not installed.')
+
+
+encoder = get_encoder(settings.JSON_ENCODER)
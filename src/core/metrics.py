@@ -0,0 +1,27 @@
+import typing as t
+
+
+MetricsProvider = t.Callable[[], t.Mapping[str, t.Any]]
+
+
+class MetricsRegistry:
+    """
+    Collects metrics of different application parts under their names.
+    A part registers a provider, the callable which returns
+    its current metrics, and the registry calls all of them on demand.
+    """
+
+    def __init__(self) -> None:
+        self._providers = {}
+
+    def register(self, name: str, provider: MetricsProvider) -> None:
+        self._providers[name] = provider
+
+    def unregister(self, name: str) -> None:
+        self._providers.pop(name, None)
+
+    def collect(self) -> t.Dict[str, t.Mapping[str, t.Any]]:
+        return {name: provider() for name, provider in self._providers.items()}
+
+
+metrics = MetricsRegistry()
@@ -34,6 +34,20 @@ class ModelObjectMixin:
 
         return param_value
 
+    def get_projection(self) -> t.Optional[t.List[str]]:
+        """
+        Returns the document fields to fetch. None means whole documents.
+        """
+
+        return None
+
+    def get_query_set(self) -> QuerySet:
+        return self.query_set_class(
+            db=self.db,
+            projection=self.get_projection(),
+            identity_map=self.identity_map,
+        )
+
     async def get_object(self) -> Model:
         """
         Finds an object in a database based on url
@@ -42,7 +56,7 @@ class ModelObjectMixin:
 
         return (
             await
-            self.query_set_class(db=self.db)
+            self.get_query_set()
             .get_one(where={self.lookup_field: self.get_url_param_value()})
         )
 
@@ -1,9 +1,18 @@
 import abc
+import base64
+import binascii
 import typing as t
 
 from aiohttp.web_request import Request
+from bson import json_util
+from bson.json_util import JSONOptions
 
+from core.db.counts import CountStrategy, ExactCount
 from core.db.query_sets import QuerySet
+from core.serialization.exceptions import ValidationError
+
+# keys are decoded like documents read by the driver, dates are naive
+CURSOR_JSON_OPTIONS = JSONOptions(tz_aware=False)
 
 
 class PaginatorBase(metaclass=abc.ABCMeta):
@@ -14,6 +23,15 @@ class PaginatorBase(metaclass=abc.ABCMeta):
     def __init__(self) -> None:
         self.count = 0
 
+    @staticmethod
+    def _normalize_number(number: t.Union[str, int, float]) -> t.Optional[int]:
+        try:
+            number = int(number)
+            return abs(number)
+        except (TypeError, ValueError):
+            pass
+        return
+
     @abc.abstractmethod
     def paginate(self, objects: QuerySet, request: Request):
         """
@@ -22,28 +40,34 @@ class PaginatorBase(metaclass=abc.ABCMeta):
 
         pass
 
+    def get_headers(self) -> t.Dict[str, str]:
+        """
+        Returns the headers describing the page, e.g. links to
+        the neighbouring pages. Called after paginate.
+        """
+
+        return {}
+
 
 class LimitOffsetPaginator(PaginatorBase):
+    """
+    Pages through objects by offset. The total number of objects,
+    got with count_strategy, is returned in the X-Total-Count header.
+    """
+
     limit_query_param: str = 'limit'
     offset_query_param: str = 'offset'
+    total_count_header: str = 'X-Total-Count'
     default_limit: int = 20
     max_limit: int = 100
-
-    @staticmethod
-    def _normalize_number(number: t.Union[str, int, float]) -> t.Optional[int]:
-        try:
-            number = int(number)
-            return abs(number)
-        except (TypeError, ValueError):
-            pass
-        return
+    count_strategy: CountStrategy = ExactCount()
 
     async def paginate(self, objects: t.Any, request: Request) -> t.List[t.Any]:
         self.count = await self.get_count(objects)
         self.limit = self.get_limit(request)
         self.offset = self.get_offset(request)
 
-        if self.offset > self.count or self.count == 0:
+        if self.count is not None and (self.offset > self.count or self.count == 0):
             return []
 
         if not self.limit:
@@ -54,8 +78,14 @@ class LimitOffsetPaginator(PaginatorBase):
     def get_slice(self, objects: t.Any, offset: int, limit: int):
         return objects.offset(offset).limit(limit)
 
-    async def get_count(self, objects: t.Any) -> int:
-        return await objects.count()
+    async def get_count(self, objects: t.Any) -> t.Optional[int]:
+        return await self.count_strategy.count(objects)
+
+    def get_headers(self) -> t.Dict[str, str]:
+        if self.count is None:
+            return {}
+
+        return {self.total_count_header: str(self.count)}
 
     def get_limit(self, request: Request) -> int:
         limit = request.query.get(self.limit_query_param, None)
@@ -72,3 +102,161 @@ class LimitOffsetPaginator(PaginatorBase):
 
         offset = request.query.get(self.offset_query_param, 0)
         return self._normalize_number(offset) or 0
+
+
+class KeysetPaginator(PaginatorBase):
+    """
+    Pages through objects ordered by unique keys (newest first by default)
+    continuing from the keys of the last seen object instead of skipping
+    documents, so every page costs the same whatever its depth.
+    The query should be backed by an index over the ordering fields.
+
+    The neighbouring pages are given as opaque cursors in the Link header.
+    A page may also start before or after an object found by anchor_field.
+    """
+
+    limit_query_param: str = 'limit'
+    cursor_query_param: str = 'cursor'
+    before_query_param: str = 'before'
+    after_query_param: str = 'after'
+    anchor_field: str = 'uuid'
+    ordering: t.Sequence[str] = ('-created_at', '-_id')
+    default_limit: int = 20
+    max_limit: int = 100
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.request = None
+        self.next_cursor = None
+        self.prev_cursor = None
+
+    @property
+    def key_fields(self) -> t.List[str]:
+        return [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, keys: t.Sequence[t.Any], backwards: bool) -> str:
+        data = json_util.dumps({'k': list(keys), 'b': backwards})
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> t.Tuple[t.List[t.Any], bool]:
+        try:
+            data = json_util.loads(
+                base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)),
+                json_options=CURSOR_JSON_OPTIONS,
+            )
+            keys, backwards = data['k'], data['b']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise ValidationError(details='Invalid cursor.')
+
+        if len(keys) != len(self.ordering):
+            raise ValidationError(details='Invalid cursor.')
+
+        return keys, bool(backwards)
+
+    def get_keys(self, obj: t.Any) -> t.List[t.Any]:
+        return [getattr(obj, field) for field in self.key_fields]
+
+    def get_keyset_filter(self, keys: t.Sequence[t.Any], backwards: bool) -> t.Dict[str, t.Any]:
+        """
+        Builds the filter for objects following the keys in the ordering,
+        or preceding them if backwards: (a, b) > (x, y) is
+        a > x or (a == x and b > y).
+        """
+
+        clauses = []
+
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-') != backwards
+            clause = {name: key for name, key in zip(self.key_fields[:i], keys[:i])}
+            clause[self.key_fields[i]] = {'$lt' if descending else '$gt': keys[i]}
+            clauses.append(clause)
+
+        return {'$or': clauses}
+
+    async def get_start(self, objects: QuerySet, request: Request) -> t.Tuple[t.Optional[t.List[t.Any]], bool]:
+        """
+        Returns the keys the page starts after and its direction.
+        """
+
+        cursor = request.query.get(self.cursor_query_param)
+
+        if cursor:
+            return self.decode_cursor(cursor)
+
+        for param, backwards in ((self.before_query_param, False), (self.after_query_param, True)):
+            value = request.query.get(param)
+
+            if value:
+                anchor = await objects.get_one(
+                    where={self.anchor_field: value},
+                    projection=self.key_fields,
+                )
+
+                if not anchor:
+                    raise ValidationError(details=f'Object "{value}" is not found.')
+
+                return self.get_keys(anchor), backwards
+
+        return None, False
+
+    def get_limit(self, request: Request) -> int:
+        limit = request.query.get(self.limit_query_param, None)
+        return min(self._normalize_number(limit) or self.default_limit, self.max_limit)
+
+    async def paginate(self, objects: t.Any, request: Request) -> t.List[t.Any]:
+        self.request = request
+        limit = self.get_limit(request)
+        keys, backwards = await self.get_start(objects, request)
+
+        if keys is not None:
+            objects.filter(where={'$and': [objects.where or {}, self.get_keyset_filter(keys, backwards)]})
+
+        fields = objects.fields if objects.fields is not None else objects.projection
+
+        if fields is not None:
+            # the keys of the page ends are needed for the cursors
+            objects.only(*set(fields).union(self.key_fields))
+
+        ordering = self.ordering
+
+        if backwards:
+            ordering = [f[1:] if f.startswith('-') else f'-{f}' for f in ordering]
+
+        # one more object tells whether there is a page after this one
+        page = await objects.sort(*ordering).limit(limit + 1)
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        if backwards:
+            page.reverse()
+
+        # the page started from keys has objects on that side at least
+        has_next = keys is not None if backwards else has_more
+        has_prev = has_more if backwards else keys is not None
+
+        if page and has_next:
+            self.next_cursor = self.encode_cursor(self.get_keys(page[-1]), backwards=False)
+
+        if page and has_prev:
+            self.prev_cursor = self.encode_cursor(self.get_keys(page[0]), backwards=True)
+
+        return page
+
+    def get_link(self, cursor: str) -> str:
+        query = {
+            k: v for k, v in self.request.query.items()
+            if k not in (self.cursor_query_param, self.before_query_param, self.after_query_param)
+        }
+        query[self.cursor_query_param] = cursor
+        return str(self.request.url.with_query(query))
+
+    def get_headers(self) -> t.Dict[str, str]:
+        links = []
+
+        if self.next_cursor:
+            links.append(f'<{self.get_link(self.next_cursor)}>; rel="next"')
+
+        if self.prev_cursor:
+            links.append(f'<{self.get_link(self.prev_cursor)}>; rel="prev"')
+
+        return {'Link': ', '.join(links)} if links else {}
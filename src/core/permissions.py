@@ -32,5 +32,10 @@ class IsAuthenticated(BasePermission):
         return request.user and request.is_authenticated
 
 
+class IsAdmin(BasePermission):
+    """
+    Checks that a request user is an administrator.
+    """
 
-
+    async def has_permission(self, request: Request) -> bool:
+        return bool(request.user and request.user.is_admin)
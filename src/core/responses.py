@@ -0,0 +1,27 @@
+import typing as t
+
+from aiohttp.web_response import Response
+
+from core.encoders import encoder
+
+
+def json_response(
+        data: t.Any = None,
+        *,
+        status: int = 200,
+        reason: str = None,
+        headers: t.Mapping[str, str] = None,
+        content_type: str = 'application/json',
+) -> Response:
+    """
+    The replacement of aiohttp's json_response which encodes
+    the data with the encoder chosen by the JSON_ENCODER setting.
+    """
+
+    return Response(
+        body=encoder.dumps_bytes(data),
+        status=status,
+        reason=reason,
+        headers=headers,
+        content_type=content_type,
+    )
@@ -4,11 +4,11 @@ import abc
 
 class BaseField:
     @abc.abstractmethod
-    async def serialize(self, value):
+    async def serialize(self, value, context=None):
         pass
 
     @abc.abstractmethod
-    async def deserialize(self, value):
+    async def deserialize(self, value, context=None):
         pass
 
     def _bind_to_serializer(self, name, serializer):
@@ -33,6 +33,10 @@ class MetaSerializer(type):
     ) -> type:
         cls = super().__new__(mcs, name, bases, attrs)
         cls.fields_map = mcs.get_fields(attrs)
+
+        for field_name, field_obj in cls.fields_map.items():
+            field_obj._bind_to_serializer(name=field_name, serializer=cls)
+
         return cls
 
 
@@ -41,13 +45,13 @@ class _CombinedMetaClasses(abc.ABCMeta, MetaSerializer):
 
 
 class BaseSerializer(metaclass=_CombinedMetaClasses):
-    def __init__(self, context: t.Mapping[str, t.Any] = None) -> None:
+    def __init__(
+            self,
+            context: t.Mapping[str, t.Any] = None,
+            fields: t.Optional[t.Iterable[str]] = None,
+    ) -> None:
         self.context = context or {}
-        self._bind_fields()
-
-    def _bind_fields(self) -> None:
-        for fields_name, field_obj in self.fields_map.items():
-            field_obj._bind_to_serializer(name=fields_name, serializer=self)
+        self.fields = frozenset(fields) if fields is not None else None
 
     @abc.abstractmethod
     async def serialize(self, data: t.Mapping[str, t.Any]):
@@ -62,5 +66,5 @@ class BaseSerializer(metaclass=_CombinedMetaClasses):
         pass
 
     @abc.abstractmethod
-    async def deserialize_many(self, objs: t.Sequence[t.Mapping[str, t.Any]]):
+    async def deserialize_many(self, objs: t.Sequence[t.Mapping[str, t.Any]], return_errors=False):
         pass
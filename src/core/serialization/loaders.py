@@ -0,0 +1,145 @@
+import typing as t
+import asyncio
+
+from core.db.identity_map import IdentityMap
+from core.db.query_sets import QuerySet
+
+LoadManyFunc = t.Callable[[t.List[t.Hashable]], t.Awaitable[t.Mapping[t.Hashable, t.Any]]]
+
+
+class BatchLoader:
+    """
+    Collects keys requested during one loop iteration and resolves
+    them with a single call of load_many_func. Results are memoized,
+    so every key is loaded at most once per loader.
+    """
+
+    def __init__(self, load_many_func: LoadManyFunc) -> None:
+        self.load_many_func = load_many_func
+        self.cache: t.Dict[t.Hashable, asyncio.Future] = {}
+        # the futures are kept with their keys, a key may be cleared while it's loading
+        self.pending: t.Dict[t.Hashable, asyncio.Future] = {}
+        self.batches = 0
+        # running batches are referenced, callers only await the futures of keys
+        self._batch_tasks: t.Set[asyncio.Future] = set()
+
+    def load(self, key: t.Hashable) -> asyncio.Future:
+        """
+        Returns a future resolved with the object for the key
+        or None if the object doesn't exist.
+        """
+
+        future = self.cache.get(key)
+
+        if future is not None:
+            return future
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self.cache[key] = future
+
+        if not self.pending:
+            loop.call_soon(self._dispatch)
+
+        self.pending[key] = future
+        return future
+
+    async def load_many(self, keys: t.Iterable[t.Hashable]) -> t.List[t.Any]:
+        return await asyncio.gather(*[self.load(key) for key in keys])
+
+    def prime(self, key: t.Hashable, value: t.Any) -> None:
+        """
+        Puts an already known object to the cache.
+        """
+
+        if key not in self.cache:
+            future = asyncio.get_event_loop().create_future()
+            future.set_result(value)
+            self.cache[key] = future
+
+    def clear(self, key: t.Hashable) -> None:
+        self.cache.pop(key, None)
+
+    def _dispatch(self) -> None:
+        futures, self.pending = self.pending, {}
+        task = asyncio.ensure_future(self._load_batch(futures))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _load_batch(self, futures: t.Dict[t.Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+
+        try:
+            objects = await self.load_many_func(list(futures))
+        except Exception as e:
+            for key, future in futures.items():
+                # failed loads aren't memoized, unless the key is loaded anew already
+                if self.cache.get(key) is future:
+                    del self.cache[key]
+
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(objects.get(key))
+
+
+class QuerySetLoader(BatchLoader):
+    """
+    Loads models of a query set by a lookup field with one $in query per batch.
+    """
+
+    def __init__(
+            self,
+            *,
+            query_set_class: t.Type[QuerySet],
+            lookup_field: str,
+            db: t.Any,
+            projection: t.Optional[t.Sequence[str]] = None,
+            identity_map: t.Optional[IdentityMap] = None,
+    ) -> None:
+        super().__init__(load_many_func=self.fetch)
+        self.query_set_class = query_set_class
+        self.lookup_field = lookup_field
+        self.db = db
+        self.projection = projection
+        self.identity_map = identity_map
+
+    async def fetch(self, keys: t.List[t.Hashable]) -> t.Dict[t.Hashable, t.Any]:
+        query_set = self.query_set_class(
+            db=self.db,
+            projection=self.projection,
+            identity_map=self.identity_map,
+        )
+        return await query_set.get_many(self.lookup_field, keys)
+
+
+def get_loader(
+        context: t.MutableMapping[str, t.Any],
+        query_set_class: t.Type[QuerySet],
+        lookup_field: str,
+        projection: t.Optional[t.Sequence[str]] = None,
+) -> QuerySetLoader:
+    """
+    Returns the loader memoized in the serializer context, creating it on first use.
+    Views put the same loaders mapping into every context of a request.
+    """
+
+    loaders = context.setdefault('loaders', {})
+    key = (query_set_class, lookup_field, tuple(projection) if projection is not None else None)
+    loader = loaders.get(key)
+
+    if loader is None:
+        request = context['request']
+        loader = QuerySetLoader(
+            query_set_class=query_set_class,
+            lookup_field=lookup_field,
+            db=request.app.mongo,
+            projection=projection,
+            identity_map=request.get('identity_map'),
+        )
+        loaders[key] = loader
+
+    return loader
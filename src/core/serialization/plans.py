@@ -0,0 +1,143 @@
+import typing as t
+from collections import abc as abc_collections
+
+from core.serialization.abc import BaseField
+from core.serialization.exceptions import ValidationError
+from core.serialization.typings import DeserializedData, SerializedData
+
+
+def ensure_mapping(data: t.Any) -> t.Mapping[str, t.Any]:
+    if not isinstance(data, abc_collections.Mapping):
+        raise ValidationError(
+            f'Expected a dictionary, but got {type(data).__name__}'
+        )
+
+    return data
+
+
+class SerializationPlan:
+    """
+    The flat list of steps compiled once per serializer class.
+    Every step knows where a value is loaded from and stored to,
+    and whether its field needs to await anything.
+    Fields which don't are called synchronously in a tight loop.
+    A plan may be compiled for a subset of fields, named as in the output.
+    """
+
+    def __init__(
+            self,
+            fields_map: t.Mapping[str, BaseField],
+            fields: t.Optional[t.AbstractSet[str]] = None,
+    ) -> None:
+        self.steps = [
+            (
+                field.load_from or name,
+                field.load_to or name,
+                field.value_for_missing,
+                field.to_representation,
+                field.is_async_serialization,
+                field,
+            )
+            for name, field in fields_map.items()
+            if not field.deserialization_only
+            and (fields is None or (field.load_to or name) in fields)
+        ]
+        self.sources = [step[0] for step in self.steps]
+        self.targets = [step[1] for step in self.steps]
+        self.is_async = any(step[4] for step in self.steps)
+        self.prefetch_steps = [
+            (load_from, field)
+            for load_from, _, _, _, _, field in self.steps
+            if field.is_prefetchable
+        ]
+
+    async def prefetch(self, objs: t.Sequence[t.Mapping[str, t.Any]], context: t.Mapping[str, t.Any]) -> None:
+        """
+        Lets every prefetchable field load what the whole page needs at once.
+        """
+
+        for load_from, field in self.prefetch_steps:
+            await field.prefetch([obj.get(load_from) for obj in objs], context=context)
+
+    def run_sync(self, data: t.Mapping[str, t.Any]) -> SerializedData:
+        return {
+            load_to: to_representation(data.get(load_from, value_for_missing))
+            for load_from, load_to, value_for_missing, to_representation, _, _ in self.steps
+        }
+
+    async def run(self, data: t.Mapping[str, t.Any], context: t.Mapping[str, t.Any]) -> SerializedData:
+        serialized_data = {}
+
+        for load_from, load_to, value_for_missing, to_representation, is_async, field in self.steps:
+            value = data.get(load_from, value_for_missing)
+
+            if is_async:
+                serialized_data[load_to] = await field.serialize(value, context=context)
+            else:
+                serialized_data[load_to] = to_representation(value)
+
+        return serialized_data
+
+
+class DeserializationPlan:
+    """
+    The deserialization counterpart of SerializationPlan.
+    """
+
+    def __init__(self, fields_map: t.Mapping[str, BaseField]) -> None:
+        self.steps = [
+            (
+                field.load_from or name,
+                field.load_to or name,
+                field.value_for_missing,
+                field.is_required and not field.default,
+                field.to_internal_type,
+                field.is_async_deserialization,
+                field,
+            )
+            for name, field in fields_map.items()
+            if not field.serialization_only
+        ]
+        self.is_async = any(step[5] for step in self.steps)
+
+    def run_sync(self, data: t.Mapping[str, t.Any], partial: bool = False) -> DeserializedData:
+        deserialized_data = {}
+
+        for load_from, load_to, value_for_missing, is_required, to_internal_type, _, _ in self.steps:
+            value = data.get(load_from, value_for_missing)
+
+            if not value:
+                if partial:
+                    continue
+
+                if is_required:
+                    raise ValidationError(details=f'{load_from} field is required.')
+
+            deserialized_data[load_to] = to_internal_type(value)
+
+        return deserialized_data
+
+    async def run(
+            self,
+            data: t.Mapping[str, t.Any],
+            context: t.Mapping[str, t.Any],
+            partial: bool = False,
+    ) -> DeserializedData:
+        deserialized_data = {}
+
+        for load_from, load_to, value_for_missing, is_required, to_internal_type, is_async, field in self.steps:
+            value = data.get(load_from, value_for_missing)
+
+            if not value:
+                if partial:
+                    continue
+
+                if is_required:
+                    raise ValidationError(details=f'{load_from} field is required.')
+
+            if is_async:
+                deserialized_data[load_to] = await field.deserialize(value, context=context)
+            else:
+                deserialized_data[load_to] = to_internal_type(value)
+
+        return deserialized_data
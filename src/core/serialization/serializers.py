@@ -1,73 +1,206 @@
 import typing as t
 import asyncio
 
+from core.cache import LRUCache
 from core.serialization.abc import BaseSerializer
 from core.serialization.exceptions import ValidationError
-from collections import abc as abc_collections
-
+from core.serialization.plans import DeserializationPlan, SerializationPlan, ensure_mapping
 from core.serialization.typings import SerializedData, DeserializedData
 
 
 class Serializer(BaseSerializer):
+    # Representations are cached only if an LRUCache is set. They are
+    # shared between requests, so callers must not modify them.
+    cache: t.Optional[LRUCache] = None
+    cache_key_field: str = 'uuid'
+    cache_version_field: str = 'version'
+
+    def __init__(
+            self,
+            context: t.Mapping[str, t.Any] = None,
+            fields: t.Optional[t.Iterable[str]] = None,
+    ) -> None:
+        super().__init__(context=context, fields=fields)
+
+        if self.fields is not None:
+            unknown_fields = self.fields - set(self.get_serialization_plan().targets)
+
+            if unknown_fields:
+                raise ValidationError(details=f'Unknown fields: {", ".join(sorted(unknown_fields))}.')
+
+            # the cache keeps only complete representations
+            self.cache = None
+
+    @classmethod
+    def get_serialization_plan(cls, fields: t.Optional[t.FrozenSet[str]] = None) -> SerializationPlan:
+        """
+        Compiles the serialization plan for the selected fields
+        (all fields by default) on first use and keeps it on the class
+        itself, so subclasses get their own plans.
+        """
+
+        plans = cls.__dict__.get('_serialization_plans')
+
+        if plans is None:
+            plans = {}
+            cls._serialization_plans = plans
+
+        plan = plans.get(fields)
+
+        if plan is None:
+            plan = SerializationPlan(cls.fields_map, fields=fields)
+            plans[fields] = plan
+
+        return plan
+
+    @classmethod
+    def get_deserialization_plan(cls) -> DeserializationPlan:
+        plan = cls.__dict__.get('_deserialization_plan')
+
+        if plan is None:
+            plan = DeserializationPlan(cls.fields_map)
+            cls._deserialization_plan = plan
+
+        return plan
+
+    @classmethod
+    def get_projection(cls, fields: t.Optional[t.Iterable[str]] = None) -> t.List[str]:
+        """
+        Returns the names of the document fields which
+        the selected serializer fields are loaded from.
+        """
+
+        plan = cls.get_serialization_plan(frozenset(fields) if fields is not None else None)
+        projection = set(plan.sources)
+
+        if fields is None and cls.cache is not None:
+            projection.update([cls.cache_key_field, cls.cache_version_field])
+
+        return sorted(projection)
+
+    @classmethod
+    def is_sync_serialization(cls, fields: t.Optional[t.FrozenSet[str]] = None) -> bool:
+        """
+        Whether objects can be serialized without touching the event loop,
+        i.e. neither serialize nor any of the fields are overridden with
+        something that awaits.
+        """
+        return cls.serialize is Serializer.serialize and not cls.get_serialization_plan(fields).is_async
+
+    @classmethod
+    def is_sync_deserialization(cls) -> bool:
+        return cls.deserialize is Serializer.deserialize and not cls.get_deserialization_plan().is_async
+
+    def get_cache_key(self, data: t.Mapping[str, t.Any]) -> t.Tuple[t.Hashable, t.Any]:
+        """
+        Returns the key and the version the representation
+        of data is cached with. Used only if cache is set.
+        """
+
+        return data[self.cache_key_field], data.get(self.cache_version_field)
+
     async def serialize(self, data: t.Mapping[str, t.Any]) -> SerializedData:
-        if not isinstance(data, abc_collections.Mapping):
-            raise ValidationError(
-                f'Expected a dictionary, but got {type(data).__name__}'
-            )
+        data = ensure_mapping(data)
 
-        serialized_data = {}
+        if self.cache is None:
+            return await self._serialize(data)
 
-        for field_name, field_obj in self.fields_map.items():
-            if field_obj.deserialization_only:
-                continue
+        key, version = self.get_cache_key(data)
+        serialized_data = self.cache.get(key, version)
 
-            load_from = field_obj.load_from or field_name
-            loaded_value = data.get(load_from, field_obj.value_for_missing)
-            serialized_value = await field_obj.serialize(loaded_value)
-            load_to = field_obj.load_to or field_name
-            serialized_data[load_to] = serialized_value
+        if serialized_data is None:
+            serialized_data = await self._serialize(data)
+            self.cache.set(key, serialized_data, version)
 
         return serialized_data
 
+    async def _serialize(self, data: t.Mapping[str, t.Any]) -> SerializedData:
+        plan = self.get_serialization_plan(self.fields)
+
+        if plan.is_async:
+            return await plan.run(data, self.context)
+
+        return plan.run_sync(data)
+
     async def deserialize(
             self,
             data: t.Mapping[str, t.Any],
             partial: bool = False,
     ) -> DeserializedData:
-        if not isinstance(data, abc_collections.Mapping):
-            raise ValidationError(
-                f'Expected a dictionary, but got {type(data).__name__}'
-            )
+        plan = self.get_deserialization_plan()
 
-        deserialized_data = {}
+        if plan.is_async:
+            return await plan.run(ensure_mapping(data), self.context, partial=partial)
 
-        for field_name, field_obj in self.fields_map.items():
-            if field_obj.serialization_only:
-                continue
+        return plan.run_sync(ensure_mapping(data), partial=partial)
 
-            load_from = field_obj.load_from or field_name
-            loaded_value = data.get(load_from, field_obj.value_for_missing)
+    async def serialize_many(
+            self,
+            objs: t.Sequence[t.Mapping[str, t.Any]],
+    ) -> t.List[SerializedData]:
+        objs = [ensure_mapping(o) for o in objs]
 
-            if not loaded_value and partial:
-                continue
+        if self.cache is None:
+            return await self._serialize_many(objs)
 
-            if not loaded_value and field_obj.is_required and not field_obj.default:
-                raise ValidationError(details=f'{load_from} field is required.')
+        keys = [self.get_cache_key(o) for o in objs]
+        serialized_objs = [self.cache.get(key, version) for key, version in keys]
+        missed = [i for i, serialized_data in enumerate(serialized_objs) if serialized_data is None]
 
-            serialized_value = await field_obj.deserialize(loaded_value)
-            load_to = field_obj.load_to or field_name
-            deserialized_data[load_to] = serialized_value
+        if missed:
+            serialized_missed = await self._serialize_many([objs[i] for i in missed])
 
-        return deserialized_data
+            for i, serialized_data in zip(missed, serialized_missed):
+                key, version = keys[i]
+                self.cache.set(key, serialized_data, version)
+                serialized_objs[i] = serialized_data
+
+        return serialized_objs
+
+    async def _serialize_many(self, objs: t.List[t.Mapping[str, t.Any]]) -> t.List[SerializedData]:
+        if self.is_sync_serialization(self.fields):
+            run_sync = self.get_serialization_plan(self.fields).run_sync
+            return [run_sync(o) for o in objs]
+
+        plan = self.get_serialization_plan(self.fields)
+        await plan.prefetch(objs, self.context)
+
+        if type(self).serialize is Serializer.serialize:
+            # Everything the plan awaits has been prefetched above,
+            # so objects are serialized one by one without spawning tasks.
+            return [await plan.run(o, self.context) for o in objs]
 
-    async def serialize_many(
-            self,
-            objs: t.Sequence[t.Mapping[str, t.Any]],
-    ) -> t.List[SerializedData]:
         return await asyncio.gather(*[self.serialize(o) for o in objs])
 
     async def deserialize_many(
             self,
             objs: t.Sequence[t.Mapping[str, t.Any]],
-    ) -> t.List[DeserializedData]:
-        return await asyncio.gather(*[self.deserialize(o) for o in objs])
+            return_errors: bool = False,
+    ) -> t.List[t.Union[DeserializedData, ValidationError]]:
+        """
+        Deserializes the objects in one pass. If return_errors is true, an invalid
+        object doesn't stop others, its ValidationError is returned in its place.
+        """
+
+        if self.is_sync_deserialization():
+            run_sync = self.get_deserialization_plan().run_sync
+            results = []
+
+            for obj in objs:
+                try:
+                    results.append(run_sync(ensure_mapping(obj)))
+                except ValidationError as e:
+                    if not return_errors:
+                        raise
+
+                    results.append(e)
+
+            return results
+
+        results = await asyncio.gather(*[self.deserialize(o) for o in objs], return_exceptions=return_errors)
+
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, ValidationError):
+                raise result
+
+        return results
@@ -60,7 +60,7 @@ def setup_cors(app: 'Application') -> None:
             config={
                 origin: aiohttp_cors.ResourceOptions(
                     allow_credentials=settings.CORS_ALLOWED_CREDENTIALS,
-                    expose_headers=settings.CORS_ALLOWED_METHODS,
+                    expose_headers=settings.CORS_EXPOSED_HEADERS,
                     allow_headers=settings.CORS_ALLOWED_HEADERS,
                     allow_methods=settings.CORS_ALLOWED_METHODS,
                 ) for origin in settings.CORS_ALLOWED_ORIGINS
@@ -1,4 +1,5 @@
 import typing as t
+import logging
 from json import JSONDecodeError
 from http import HTTPStatus
 
@@ -11,24 +12,34 @@ from aiohttp.web_exceptions import (
     HTTPException,
     HTTPUnauthorized,
     HTTPForbidden,
+    HTTPNotFound,
 )
-from aiohttp.web_response import Response, json_response
+from aiohttp.web_response import Response, StreamResponse
 
 from core.authentication import BaseAuthentication
+from core.db.counts import CountStrategy
+from core.db.identity_map import IdentityMap
 from core.db.models import Model
-from core.db.query_sets import QuerySet
+from core.db.query_sets import QuerySet, SaveResult
+from core.encoders import encoder
 from core.mixins import ModelObjectMixin
 from core.paginators import LimitOffsetPaginator, PaginatorBase
 from core.permissions import BasePermission
+from core.responses import json_response
 from core.serialization.abc import BaseSerializer
 from core.serialization.exceptions import ValidationError
 from core.serialization.typings import DeserializedData, SerializedData
 
+logger = logging.getLogger(__name__)
+
 
 class ApiView(AbstractView):
     authentication_classes: t.Sequence[t.Type[BaseAuthentication]] = []
     serializer_class: t.Type[BaseSerializer] = None
     permission_classes: t.Sequence[t.Type[BasePermission]] = []
+    fields_query_param: t.Optional[str] = None
+    # keeps documents read during the request, so query sets read them once
+    use_identity_map: bool = False
 
     def __await__(self) -> t.Generator[t.Any, None, t.Any]:
         return self.dispatch().__await__()
@@ -41,6 +52,14 @@ class ApiView(AbstractView):
 
         return self.request.app.mongo
 
+    @property
+    def identity_map(self) -> t.Optional[IdentityMap]:
+        """
+        The identity map of the request, if the view uses it.
+        """
+
+        return self.request.get('identity_map')
+
     def get_handler_or_raise_405(self) -> t.Callable[[], t.Coroutine[t.Any, t.Any, Response]]:
         """
         Finds and returns the handler in current class for requested method.
@@ -70,6 +89,10 @@ class ApiView(AbstractView):
         """
 
         handler = self.get_handler_or_raise_405()
+
+        if self.use_identity_map:
+            self.request.setdefault('identity_map', IdentityMap())
+
         await self.perform_authentication()
         await self.check_permissions()
 
@@ -140,16 +163,40 @@ class ApiView(AbstractView):
     def get_serializer_context(self) -> t.Dict[str, t.Any]:
         """
         Forms the context that will be passed to serializer.
+        Batch loaders are kept on the request, so objects loaded
+        by one serializer are reused by others during the request.
         """
 
-        return {'request': self.request}
+        return {
+            'request': self.request,
+            'loaders': self.request.setdefault('loaders', {}),
+        }
+
+    def get_requested_fields(self) -> t.Optional[t.List[str]]:
+        """
+        Returns the names of the fields a client asked for
+        like "?fields=id,text" or None if all fields are needed.
+        """
+
+        if not self.fields_query_param:
+            return None
+
+        fields = self.request.query.get(self.fields_query_param)
+
+        if not fields:
+            return None
+
+        return [f.strip() for f in fields.split(',') if f.strip()]
 
     def get_serializer(self) -> BaseSerializer:
         """
         Initiates a serializer and returns it.
         """
 
-        return self.serializer_class(context=self.get_serializer_context())
+        return self.serializer_class(
+            context=self.get_serializer_context(),
+            fields=self.get_requested_fields(),
+        )
 
 
 class ListApiView(ApiView):
@@ -159,46 +206,169 @@ class ListApiView(ApiView):
 
     paginator_class: t.Type[PaginatorBase] = LimitOffsetPaginator
     query_set_class: t.Type[QuerySet] = None
+    fields_query_param = 'fields'
+    stream: bool = False
+    stream_chunk_size: int = 100
+    paginator: t.Optional[PaginatorBase] = None
+    # overrides the count strategy of the paginator, e.g. NoCount()
+    count_strategy: t.Optional[CountStrategy] = None
+
+    def get_projection(self) -> t.Optional[t.List[str]]:
+        """
+        Returns the document fields the serializer needs,
+        so nothing else is fetched from the database.
+        """
+
+        return self.serializer_class.get_projection(self.get_requested_fields())
+
+    def get_query_set(self) -> QuerySet:
+        return self.query_set_class(
+            db=self.db,
+            projection=self.get_projection(),
+            identity_map=self.identity_map,
+        )
 
     async def get_objects(self) -> t.Awaitable:
         """
         Returns list of objects that will be processed.
         """
 
-        return self.query_set_class(db=self.db).all()
+        return self.get_query_set().all()
 
     async def paginate(self, objects: t) -> t.List:
         if not self.paginator_class:
             return objects
 
-        return await self.paginator_class().paginate(
+        self.paginator = self.get_paginator()
+
+        return await self.paginator.paginate(
             objects=objects,
             request=self.request,
         )
 
+    def get_paginator(self) -> PaginatorBase:
+        paginator = self.paginator_class()
+
+        if self.count_strategy is not None:
+            paginator.count_strategy = self.count_strategy
+
+        return paginator
+
+    def get_headers(self) -> t.Dict[str, str]:
+        """
+        Returns the headers of the list response.
+        """
+
+        return self.paginator.get_headers() if self.paginator else {}
+
     async def get(self) -> Response:
+        try:
+            serializer = self.get_serializer()
+        except ValidationError as e:
+            return json_response(
+                data={'errors': e.details},
+                status=HTTPStatus.BAD_REQUEST.value,
+            )
+
         filtered_objects = await self.get_objects()
-        paginated_objects = await self.paginate(filtered_objects)
-        objects_as_dict = [f.as_dict for f in await paginated_objects]
-        serialized_objects = await self.get_serializer().serialize_many(objects_as_dict)
+
+        try:
+            paginated_objects = await self.paginate(filtered_objects)
+        except ValidationError as e:
+            return json_response(
+                data={'errors': e.details},
+                status=HTTPStatus.BAD_REQUEST.value,
+            )
+
+        if self.stream:
+            return await self.stream_objects(paginated_objects, serializer)
+
+        if isinstance(paginated_objects, QuerySet):
+            paginated_objects = await paginated_objects
+
+        objects_as_dict = [f.as_dict for f in paginated_objects]
+        serialized_objects = await serializer.serialize_many(objects_as_dict)
 
         return json_response(
             data=serialized_objects,
             status=HTTPStatus.OK.value,
+            headers=self.get_headers(),
         )
 
+    async def stream_objects(
+            self,
+            objects: t.Union[QuerySet, t.List[Model]],
+            serializer: BaseSerializer,
+    ) -> StreamResponse:
+        """
+        Writes the objects as a JSON array with chunked encoding.
+        The cursor is read and serialized by stream_chunk_size objects,
+        so memory doesn't grow with the page size.
+        """
+
+        response = StreamResponse(status=HTTPStatus.OK.value, headers=self.get_headers())
+        response.content_type = 'application/json'
+        response.enable_chunked_encoding()
+        await response.prepare(self.request)
+
+        separator = b'['
+
+        try:
+            async for chunk in self.iterate_chunks(objects):
+                serialized_objects = await serializer.serialize_many([o.as_dict for o in chunk])
+                encoded_objects = [encoder.dumps_bytes(o) for o in serialized_objects]
+                await response.write(separator + b','.join(encoded_objects))
+                separator = b','
+        except Exception:
+            # The status is already sent, so the only way to tell
+            # the client about the error is to break the array.
+            logger.exception('Failed to stream objects.')
+
+            # None if the client is gone already
+            if self.request.transport is not None:
+                self.request.transport.close()
+
+            return response
+
+        await response.write(b']' if separator == b',' else b'[]')
+        await response.write_eof()
+        return response
+
+    async def iterate_chunks(
+            self,
+            objects: t.Union[QuerySet, t.List[Model]],
+    ) -> t.AsyncIterator[t.List[Model]]:
+        if isinstance(objects, QuerySet):
+            async for chunk in objects.chunks(self.stream_chunk_size):
+                yield chunk
+        elif objects:
+            yield objects
+
 
 class DetailApiView(ModelObjectMixin, ApiView):
     """
     The view helper for requesting of certain objects.
     """
 
+    fields_query_param = 'fields'
+
+    def get_projection(self) -> t.Optional[t.List[str]]:
+        return self.serializer_class.get_projection(self.get_requested_fields())
+
     async def get(self) -> Response:
+        try:
+            serializer = self.get_serializer()
+        except ValidationError as e:
+            return json_response(
+                data={'errors': e.details},
+                status=HTTPStatus.BAD_REQUEST.value,
+            )
+
         obj = await self._get_object_or_404()
         await self.check_object_permissions(obj)
 
         return json_response(
-            data=await self.get_serializer().serialize(obj.as_dict),
+            data=await serializer.serialize(obj.as_dict),
             status=HTTPStatus.OK.value,
         )
 
@@ -263,7 +433,125 @@ class CreateApiView(ApiView):
         Initiates the process of object insertion to database.
         """
 
-        return await self.query_set_class(db=self.db).insert_one(model)
+        query_set = self.query_set_class(db=self.db, identity_map=self.identity_map)
+        return await query_set.insert_one(model)
+
+
+class BulkCreateApiView(ApiView):
+    """
+    The view helper for creation of many objects with one request.
+    The body is a JSON array or NDJSON, an object per line. Invalid
+    objects don't prevent others from being created; errors
+    are reported for every object by its index in the body.
+    """
+
+    query_set_class: t.Type[QuerySet] = None
+    max_objects: int = 1000
+    ndjson_content_types: t.Collection[str] = ('application/x-ndjson', 'application/jsonl')
+
+    async def get_request_objects(self) -> t.List[t.Any]:
+        """
+        Parses the body into a list of objects. An NDJSON line
+        which isn't valid JSON is returned as its ValidationError.
+        """
+
+        body = await self.request.read()
+
+        if self.request.content_type in self.ndjson_content_types:
+            objects = []
+
+            for line in body.splitlines():
+                if not line.strip():
+                    continue
+
+                try:
+                    objects.append(encoder.loads(line))
+                except ValueError as e:
+                    # JSONDecodeError or UnicodeDecodeError
+                    objects.append(ValidationError(details=f'Invalid JSON: {e}'))
+        else:
+            try:
+                objects = encoder.loads(body)
+            except ValueError as e:
+                raise ValidationError(details=f'Invalid JSON: {e}')
+
+            if not isinstance(objects, list):
+                raise ValidationError(details='Expected an array of objects.')
+
+        if len(objects) > self.max_objects:
+            raise ValidationError(details=f'Expected at most {self.max_objects} objects.')
+
+        return objects
+
+    async def post_serialize(self, serialized_data: t.List[SerializedData]) -> t.List[SerializedData]:
+        """
+        Override this method if you need execute code after serialization.
+        """
+
+        return serialized_data
+
+    async def post(self) -> Response:
+        try:
+            objects = await self.get_request_objects()
+        except ValidationError as e:
+            return json_response(
+                data={'errors': e.details},
+                status=HTTPStatus.BAD_REQUEST.value,
+            )
+
+        serializer = self.get_serializer()
+        models, indexes, errors = [], [], []
+
+        parsed = [(i, obj) for i, obj in enumerate(objects) if not isinstance(obj, ValidationError)]
+        deserialized_objects = await serializer.deserialize_many([obj for _, obj in parsed], return_errors=True)
+        results = dict(zip((i for i, _ in parsed), deserialized_objects))
+
+        for index, obj in enumerate(objects):
+            result = results.get(index, obj)
+
+            if isinstance(result, ValidationError):
+                errors.append({'index': index, 'errors': result.details})
+            else:
+                models.append(await self.init_model(result))
+                indexes.append(index)
+
+        write_errors = await self.create_many(models) if models else {}
+        errors.extend({'index': indexes[i], 'errors': error} for i, error in write_errors.items())
+        errors.sort(key=lambda error: error['index'])
+
+        created_models = [m for i, m in enumerate(models) if i not in write_errors]
+        serialized_objects = await serializer.serialize_many([m.as_dict for m in created_models])
+
+        if serialized_objects:
+            serialized_objects = await self.post_serialize(serialized_objects)
+
+        if not errors:
+            status = HTTPStatus.CREATED
+        elif serialized_objects:
+            status = HTTPStatus.MULTI_STATUS
+        else:
+            status = HTTPStatus.BAD_REQUEST
+
+        return json_response(
+            data={'created': serialized_objects, 'errors': errors},
+            status=status.value,
+        )
+
+    async def init_model(self, deserialized_object: DeserializedData) -> Model:
+        """
+        Initiates a model object with deserialized data.
+        """
+
+        return self.query_set_class.model_class(**deserialized_object)
+
+    async def create_many(self, models: t.List[Model]) -> t.Dict[int, str]:
+        """
+        Inserts the models with one unordered bulk write and
+        returns the errors of failed ones by their indexes.
+        """
+
+        query_set = self.query_set_class(db=self.db, identity_map=self.identity_map)
+        return await query_set.insert_many(models, ordered=False)
 
 
 class DestroyApiView(ModelObjectMixin, ApiView):
@@ -276,7 +564,8 @@ class DestroyApiView(ModelObjectMixin, ApiView):
         Initiates the process of object deletion from database.
         """
 
-        await self.query_set_class(db=self.db).delete_one(
+        query_set = self.query_set_class(db=self.db, identity_map=self.identity_map)
+        await query_set.delete_one(
             where={self.lookup_field: getattr(model, self.lookup_field)},
         )
 
@@ -324,12 +613,18 @@ class UpdateApiView(ModelObjectMixin, ApiView):
     async def update(self, obj: Model, data: t.Mapping[str, t.Any]) -> Model:
         """
         Initiates the process of object updating in database.
+        Only the changed fields are written, nothing if there are none.
         """
 
-        return await self.query_set_class(db=self.db).update_one(
-            where={self.lookup_field: getattr(obj, self.lookup_field)},
-            data=data,
-        )
+        where = {self.lookup_field: getattr(obj, self.lookup_field)}
+        obj.set_values(data)
+        query_set = self.query_set_class(db=self.db, identity_map=self.identity_map)
+
+        if await query_set.save(obj, where=where) is SaveResult.NOT_FOUND:
+            # deleted since it was read
+            raise HTTPNotFound()
+
+        return obj
 
     async def put(self, partial: bool = False) -> Response:
         obj = await self._get_object_or_404()
@@ -0,0 +1,245 @@
+import typing as t
+import abc
+import asyncio
+import logging
+import uuid
+from urllib.parse import urlparse
+
+from conf import settings
+from core.encoders import encoder
+
+logger = logging.getLogger(__name__)
+
+# receives messages like {"epoch": "...", "seq": 1, "payload": {...}}
+EventHandler = t.Callable[[t.Dict[str, t.Any]], t.Any]
+
+MAX_LINE_SIZE = 16 * 1024 * 1024
+
+
+def open_connection(url: str) -> t.Awaitable[t.Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+    """
+    Opens a stream connection to "tcp://host:port" or "unix:///path/to.sock".
+    """
+
+    parsed = urlparse(url)
+
+    if parsed.scheme == 'unix':
+        return asyncio.open_unix_connection(parsed.path, limit=MAX_LINE_SIZE)
+
+    if parsed.scheme == 'tcp':
+        return asyncio.open_connection(parsed.hostname, parsed.port, limit=MAX_LINE_SIZE)
+
+    raise ValueError(f'Unsupported backplane url: {url}')
+
+
+def start_server(url: str, client_connected_cb: t.Callable) -> t.Awaitable[asyncio.AbstractServer]:
+    """
+    Starts a stream server listening on "tcp://host:port" or "unix:///path/to.sock".
+    """
+
+    parsed = urlparse(url)
+
+    if parsed.scheme == 'unix':
+        return asyncio.start_unix_server(client_connected_cb, parsed.path, limit=MAX_LINE_SIZE)
+
+    if parsed.scheme == 'tcp':
+        return asyncio.start_server(
+            client_connected_cb, parsed.hostname, parsed.port, limit=MAX_LINE_SIZE,
+        )
+
+    raise ValueError(f'Unsupported backplane url: {url}')
+
+
+class BaseBackplane(metaclass=abc.ABCMeta):
+    """
+    Delivers published events to the subscribers of every worker.
+
+    Every delivered event carries an epoch and a sequence number assigned
+    by the single sequencer of the backplane. Events with a sequence number
+    which was already seen are dropped, skipped numbers are counted as gaps.
+    """
+
+    def __init__(self, on_event: EventHandler) -> None:
+        self.on_event = on_event
+        self.epoch = None
+        self.last_seq = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.gaps = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def publish(self, payload: t.Dict[str, t.Any]) -> None:
+        """
+        Sends the payload to the subscribers of every worker.
+        """
+
+        pass
+
+    def deliver(self, message: t.Mapping[str, t.Any]) -> None:
+        """
+        Checks the sequence number of a message and passes
+        it to the local subscribers.
+        """
+
+        epoch, seq = message['epoch'], message['seq']
+
+        if epoch != self.epoch:
+            self.epoch, self.last_seq = epoch, seq - 1
+
+        if seq <= self.last_seq:
+            self.duplicates += 1
+            return
+
+        if seq > self.last_seq + 1:
+            self.gaps += 1
+            logger.warning(
+                'Backplane skipped %d event(s) before seq %d.',
+                seq - self.last_seq - 1, seq,
+            )
+
+        self.last_seq = seq
+        self.delivered += 1
+        self.on_event(message)
+
+    @property
+    def stats(self) -> t.Dict[str, t.Any]:
+        return {
+            'epoch': self.epoch,
+            'last_seq': self.last_seq,
+            'delivered': self.delivered,
+            'duplicates': self.duplicates,
+            'gaps': self.gaps,
+        }
+
+
+class InProcessBackplane(BaseBackplane):
+    """
+    The backplane for a single worker. Events are delivered synchronously.
+    """
+
+    def __init__(self, on_event: EventHandler) -> None:
+        super().__init__(on_event)
+        self._epoch = uuid.uuid4().hex
+        self._seq = 0
+
+    async def publish(self, payload: t.Dict[str, t.Any]) -> None:
+        self._seq += 1
+        self.deliver({'epoch': self._epoch, 'seq': self._seq, 'payload': payload})
+
+
+class HubBackplane(BaseBackplane):
+    """
+    The backplane which exchanges events through BackplaneHub.
+    Every worker keeps one stream connection to the hub, the hub
+    stamps each event and relays it to all workers including the publisher.
+    """
+
+    reconnect_delay: float = 1.0
+
+    def __init__(self, on_event: EventHandler, url: str = None) -> None:
+        super().__init__(on_event)
+        self.url = url or settings.WS_BACKPLANE_HUB_URL
+        self._writer = None
+        self._reader_task = None
+
+    async def start(self) -> None:
+        self._reader_task = asyncio.ensure_future(self._read_forever())
+
+    async def stop(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+    async def publish(self, payload: t.Dict[str, t.Any]) -> None:
+        if self._writer is None:
+            logger.warning('Backplane hub %s is unavailable, the event is lost.', self.url)
+            return
+
+        try:
+            self._writer.write(encoder.dumps_bytes({'payload': payload}) + b'\n')
+            await self._writer.drain()
+        except OSError as e:
+            # the reader reconnects, the caller's write is already done
+            logger.warning('Backplane hub %s is unavailable, the event is lost: %s', self.url, e)
+
+    async def _read_forever(self) -> None:
+        while True:
+            try:
+                reader, writer = await open_connection(self.url)
+            except OSError as e:
+                logger.warning('Cannot connect to backplane hub %s: %s', self.url, e)
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            self._writer = writer
+
+            try:
+                async for line in reader:
+                    self.deliver(encoder.loads(line))
+            except (ConnectionError, ValueError) as e:
+                logger.warning('Backplane hub connection is broken: %s', e)
+            finally:
+                self._writer = None
+                writer.close()
+
+            await asyncio.sleep(self.reconnect_delay)
+
+
+class BackplaneHub:
+    """
+    The relay for HubBackplane. Accepts newline-delimited JSON events from
+    workers, stamps them with the hub epoch and the next sequence number
+    and writes them to every connected worker.
+    """
+
+    max_peer_buffer_size: int = 64 * 1024 * 1024
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.epoch = uuid.uuid4().hex
+        self.seq = 0
+        self.peers = set()
+        self.server = None
+
+    async def start(self) -> None:
+        self.server = await start_server(self.url, self._handle_peer)
+
+    async def stop(self) -> None:
+        for peer in list(self.peers):
+            peer.close()
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.peers.add(writer)
+
+        try:
+            async for line in reader:
+                self.relay(encoder.loads(line)['payload'])
+        except (ConnectionError, ValueError, KeyError) as e:
+            logger.warning('Dropping a backplane peer: %s', e)
+        finally:
+            self.peers.discard(writer)
+            writer.close()
+
+    def relay(self, payload: t.Dict[str, t.Any]) -> None:
+        self.seq += 1
+        message = {'epoch': self.epoch, 'seq': self.seq, 'payload': payload}
+        line = encoder.dumps_bytes(message) + b'\n'
+
+        for peer in list(self.peers):
+            if peer.transport.get_write_buffer_size() > self.max_peer_buffer_size:
+                logger.warning('Dropping a slow backplane peer.')
+                self.peers.discard(peer)
+                peer.close()
+                continue
+
+            peer.write(line)
@@ -0,0 +1,60 @@
+import typing as t
+
+from core.ws.event_log import EventLog
+from core.ws.registry import ConnectionRegistry
+
+
+class Broadcaster:
+    """
+    Sends events to many websocket connections.
+    An event is encoded once per codec and the same frame is put
+    into the outbound queue of every connection using that codec.
+    """
+
+    def __init__(self, connections: ConnectionRegistry, event_log: EventLog) -> None:
+        self.connections = connections
+        self.event_log = event_log
+
+    def broadcast(self, payload: t.Any, topic: str = None) -> int:
+        """
+        Queues the payload for subscribers of the topic, or for every
+        connection if the topic isn't passed, and returns the number
+        of connections which accepted it.
+        """
+
+        if topic is None:
+            connections = tuple(self.connections)
+        else:
+            connections = self.connections.get_subscribers(topic)
+
+        frames = {}
+        accepted = 0
+
+        for connection in connections:
+            codec = connection.codec
+            frame = frames.get(codec.name)
+
+            if frame is None:
+                frame = frames[codec.name] = codec.encode(payload)
+
+            accepted += connection.send_frame(frame)
+
+        return accepted
+
+    def deliver(self, message: t.Mapping[str, t.Any]) -> int:
+        """
+        Stamps the event of a message received from the backplane
+        with its sequence number, keeps it in the event log and broadcasts it.
+        Events published with "replay": false are ephemeral, they are
+        broadcast as is and can't be resumed.
+        """
+
+        payload = message['payload']
+        topic = payload.get('topic')
+
+        if not payload.get('replay', True):
+            return self.broadcast(payload['event'], topic=topic)
+
+        event = dict(payload['event'], seq=message['seq'])
+        self.event_log.append(message['epoch'], message['seq'], topic, event)
+        return self.broadcast(event, topic=topic)
@@ -0,0 +1,69 @@
+import typing as t
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from core.encoders import encode_default, encoder
+
+
+Frame = t.Union[str, bytes]
+
+
+class JSONCodec:
+    """
+    Encodes events as JSON text frames. This is the default codec.
+    """
+
+    name = 'json'
+    binary = False
+
+    def encode(self, payload: t.Any) -> str:
+        return encoder.dumps(payload)
+
+    def decode(self, frame: Frame) -> t.Any:
+        return encoder.loads(frame)
+
+    def join(self, frames: t.Sequence[str]) -> str:
+        """
+        Packs already encoded frames into a single array frame.
+        """
+
+        return '[' + ','.join(frames) + ']'
+
+
+class MsgPackCodec:
+    """
+    Encodes events as MessagePack binary frames.
+    Available only if the msgpack package is installed.
+    """
+
+    name = 'msgpack'
+    binary = True
+
+    def encode(self, payload: t.Any) -> bytes:
+        return msgpack.packb(payload, use_bin_type=True, default=encode_default)
+
+    def decode(self, frame: Frame) -> t.Any:
+        return msgpack.unpackb(frame, raw=False)
+
+    def join(self, frames: t.Sequence[bytes]) -> bytes:
+        return msgpack.Packer().pack_array_header(len(frames)) + b''.join(frames)
+
+
+default_codec = JSONCodec()
+
+codecs = {default_codec.name: default_codec}
+
+if msgpack is not None:
+    codecs[MsgPackCodec.name] = MsgPackCodec()
+
+
+def get_codec(protocol: t.Optional[str]) -> t.Union[JSONCodec, MsgPackCodec]:
+    """
+    Returns the codec for a websocket subprotocol negotiated
+    during the handshake or the default codec.
+    """
+
+    return codecs.get(protocol, default_codec)
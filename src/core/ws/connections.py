@@ -0,0 +1,278 @@
+import typing as t
+import asyncio
+import enum
+import sys
+import time
+import uuid
+
+from aiohttp import web, WSCloseCode
+
+from core.metrics import metrics
+from core.ws.codecs import Frame, JSONCodec, MsgPackCodec, default_codec
+
+
+class SlowConsumerPolicy(str, enum.Enum):
+    """
+    Describes what happens with a connection whose outbound queue is full.
+    """
+
+    DROP = 'drop'
+    DISCONNECT = 'disconnect'
+
+
+class FrameStats:
+    """
+    Counts events and frames written to all websockets.
+    The ratio of events to frames shows how well events are coalesced.
+    """
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.frames = 0
+        self.coalesced_frames = 0
+
+    def add(self, events: int) -> None:
+        self.events += events
+        self.frames += 1
+
+        if events > 1:
+            self.coalesced_frames += 1
+
+    @property
+    def as_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            'events': self.events,
+            'frames': self.frames,
+            'coalesced_frames': self.coalesced_frames,
+            'batching_ratio': self.events / self.frames if self.frames else 0.0,
+        }
+
+
+frame_stats = FrameStats()
+metrics.register('ws.frames', lambda: frame_stats.as_dict)
+
+
+class WSConnection:
+    """
+    Wraps a websocket and owns a bounded queue of outbound frames.
+    Frames are written by a dedicated task, so a slow socket never
+    holds up the code that puts frames into the queue.
+
+    If coalesce_window is set, frames queued within the window after
+    the first one (but no more than coalesce_max_events) are written
+    as a single array frame.
+
+    Frames are encoded with the codec of the connection,
+    which depends on the negotiated subprotocol.
+    """
+
+    def __init__(
+            self,
+            ws: web.WebSocketResponse,
+            *,
+            queue_size: int,
+            policy: SlowConsumerPolicy = SlowConsumerPolicy.DISCONNECT,
+            user_uuid: str = None,
+            coalesce_window: float = 0,
+            coalesce_max_events: int = 1,
+            codec: t.Union[JSONCodec, MsgPackCodec] = default_codec,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.ws = ws
+        self.user_uuid = user_uuid
+        self.codec = codec
+        self.topics = set()
+        self.policy = SlowConsumerPolicy(policy)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_events = max(coalesce_max_events, 1)
+        self.connected_at = time.time()
+        self.last_activity = time.monotonic()
+        self.dropped_frames = 0
+        self.events_sent = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.queued_bytes = 0
+        self._writer = None
+        self._closing = False
+        # the close started by the connection itself, referenced until it's done
+        self._close_task = None
+        self._close_callbacks = []
+
+    @property
+    def closed(self) -> bool:
+        return self._closing or self.ws.closed
+
+    @property
+    def idle_time(self) -> float:
+        """
+        Seconds since the last frame received from the client.
+        """
+
+        return time.monotonic() - self.last_activity
+
+    @property
+    def memory_estimate(self) -> int:
+        """
+        The rough number of bytes held by the connection. Queued frames are
+        usually shared between connections, so they are counted in full here.
+        """
+
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+            + sys.getsizeof(self.topics) + sum(sys.getsizeof(topic) for topic in self.topics)
+            + self.queued_bytes
+        )
+
+    @property
+    def stats(self) -> t.Dict[str, t.Any]:
+        return {
+            'id': self.id,
+            'user_uuid': self.user_uuid,
+            'codec': self.codec.name,
+            'connected_at': self.connected_at,
+            'idle_time': self.idle_time,
+            'topics': sorted(self.topics),
+            'frames_received': self.frames_received,
+            'bytes_received': self.bytes_received,
+            'events_sent': self.events_sent,
+            'frames_sent': self.frames_sent,
+            'bytes_sent': self.bytes_sent,
+            'dropped_frames': self.dropped_frames,
+            'queued_frames': self.queue.qsize(),
+            'queued_bytes': self.queued_bytes,
+            'memory_estimate': self.memory_estimate,
+        }
+
+    def touch(self, received_bytes: int) -> None:
+        """
+        Accounts a frame received from the client.
+        """
+
+        self.last_activity = time.monotonic()
+        self.frames_received += 1
+        self.bytes_received += received_bytes
+
+    def add_close_callback(self, callback: t.Callable[['WSConnection'], t.Any]) -> None:
+        """
+        Registers a callback which is called once the connection is closed.
+        """
+
+        self._close_callbacks.append(callback)
+
+    def start(self) -> None:
+        """
+        Starts the task which writes queued frames to the websocket.
+        """
+
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write_frames())
+
+    def stop(self) -> None:
+        """
+        Stops the writer task and runs close callbacks.
+        Frames left in the queue are discarded.
+        """
+
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+        callbacks, self._close_callbacks = self._close_callbacks, []
+
+        for callback in callbacks:
+            callback(self)
+
+    def send_frame(self, frame: Frame) -> bool:
+        """
+        Puts an already encoded frame into the outbound queue without waiting.
+        Returns False if the frame wasn't accepted.
+        """
+
+        if self.closed:
+            return False
+
+        try:
+            self.queue.put_nowait(frame)
+            self.queued_bytes += len(frame)
+        except asyncio.QueueFull:
+            self.dropped_frames += 1
+
+            if self.policy == SlowConsumerPolicy.DISCONNECT:
+                self.stop()
+                self._closing = True
+                self._close_task = asyncio.ensure_future(self.close(
+                    code=WSCloseCode.POLICY_VIOLATION,
+                    message='Slow consumer.',
+                ))
+
+            return False
+
+        return True
+
+    def send_payload(self, payload: t.Any) -> bool:
+        """
+        Encodes the payload and puts it into the outbound queue.
+        """
+
+        return self.send_frame(self.codec.encode(payload))
+
+    async def close(self, code: int = WSCloseCode.OK, message: t.Union[str, bytes] = b'') -> None:
+        self._closing = True
+        self.stop()
+        await self.ws.close(code=code, message=message)
+
+    async def _collect_frames(self) -> t.List[Frame]:
+        """
+        Waits for the next frame and, if coalescing is enabled,
+        for frames queued within the coalescing window after it.
+        """
+
+        frames = [await self.queue.get()]
+
+        if not self.coalesce_window:
+            self.queued_bytes -= len(frames[0])
+            return frames
+
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.coalesce_window
+
+        while len(frames) < self.coalesce_max_events:
+            if not self.queue.empty():
+                frames.append(self.queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+
+            if timeout <= 0:
+                break
+
+            try:
+                frames.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        self.queued_bytes -= sum(len(f) for f in frames)
+        return frames
+
+    async def _write_frames(self) -> None:
+        while True:
+            frames = await self._collect_frames()
+            frame = frames[0] if len(frames) == 1 else self.codec.join(frames)
+
+            try:
+                if self.codec.binary:
+                    await self.ws.send_bytes(frame)
+                else:
+                    await self.ws.send_str(frame)
+            except (ConnectionError, RuntimeError):
+                self._writer = None
+                self.stop()
+                break
+
+            self.events_sent += len(frames)
+            self.frames_sent += 1
+            self.bytes_sent += len(frame)
+            frame_stats.add(len(frames))
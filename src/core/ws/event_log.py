@@ -0,0 +1,69 @@
+import typing as t
+import collections
+
+
+class EventLog:
+    """
+    Keeps the last delivered events in a bounded ring buffer,
+    so a reconnecting client can get only the events it missed.
+    Sequence numbers are the ones assigned by the backplane and
+    are comparable only within the same backplane epoch.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.events = collections.deque(maxlen=size)
+        self.epoch = None
+        self.last_seq = 0
+        # all events after this sequence number are in the log
+        self.complete_after = 0
+
+    def append(self, epoch: str, seq: int, topic: t.Optional[str], event: t.Mapping[str, t.Any]) -> None:
+        if epoch != self.epoch:
+            self.events.clear()
+            self.epoch = epoch
+            self.complete_after = seq - 1
+
+        if len(self.events) == self.events.maxlen:
+            self.complete_after = self.events[0][0]
+
+        self.events.append((seq, topic, event))
+        self.last_seq = seq
+
+    def since(
+            self,
+            seq: int,
+            topics: t.Collection[str],
+            epoch: str = None,
+    ) -> t.Optional[t.List[t.Mapping[str, t.Any]]]:
+        """
+        Returns events of the topics with sequence numbers greater than seq.
+        Returns None if the events after seq can't be restored anymore
+        and the client has to resynchronize from scratch.
+        """
+
+        if epoch is not None and epoch != self.epoch:
+            return
+
+        if seq > self.last_seq:
+            return
+
+        if seq == self.last_seq:
+            return []
+
+        if seq < self.complete_after:
+            return
+
+        return [
+            event
+            for event_seq, topic, event in self.events
+            if event_seq > seq and (topic is None or topic in topics)
+        ]
+
+    @property
+    def stats(self) -> t.Dict[str, t.Any]:
+        return {
+            'epoch': self.epoch,
+            'size': len(self.events),
+            'complete_after': self.complete_after,
+            'last_seq': self.last_seq,
+        }
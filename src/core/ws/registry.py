@@ -0,0 +1,103 @@
+import typing as t
+import weakref
+
+from core.ws.connections import WSConnection
+
+
+class ConnectionRegistry:
+    """
+    Keeps live websocket connections indexed by connection id, by user uuid
+    and by subscribed topic. Connections are held weakly and removed as soon
+    as they are closed, so the registry never grows with connections which are gone.
+    """
+
+    def __init__(self) -> None:
+        self._by_id = weakref.WeakValueDictionary()
+        self._by_user = {}
+        self._by_topic = {}
+
+    def __iter__(self) -> t.Iterator[WSConnection]:
+        return iter(list(self._by_id.values()))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, connection: WSConnection) -> bool:
+        return self._by_id.get(connection.id) is connection
+
+    def add(self, connection: WSConnection) -> None:
+        self._by_id[connection.id] = connection
+
+        if connection.user_uuid is not None:
+            self._by_user.setdefault(connection.user_uuid, weakref.WeakSet()).add(connection)
+
+        connection.add_close_callback(self.discard)
+
+    def discard(self, connection: WSConnection) -> None:
+        if self._by_id.get(connection.id) is connection:
+            del self._by_id[connection.id]
+
+        user_connections = self._by_user.get(connection.user_uuid)
+
+        if user_connections is not None:
+            user_connections.discard(connection)
+
+            if not user_connections:
+                del self._by_user[connection.user_uuid]
+
+        for topic in list(connection.topics):
+            self.unsubscribe(connection, topic)
+
+    def subscribe(self, connection: WSConnection, topic: str) -> None:
+        self._by_topic.setdefault(topic, weakref.WeakSet()).add(connection)
+        connection.topics.add(topic)
+
+    def unsubscribe(self, connection: WSConnection, topic: str) -> None:
+        connection.topics.discard(topic)
+        subscribers = self._by_topic.get(topic)
+
+        if subscribers is not None:
+            subscribers.discard(connection)
+
+            if not subscribers:
+                del self._by_topic[topic]
+
+    def get_subscribers(self, topic: str) -> t.List[WSConnection]:
+        return list(self._by_topic.get(topic, ()))
+
+    def get(self, connection_id: str) -> t.Optional[WSConnection]:
+        return self._by_id.get(connection_id)
+
+    def get_by_user(self, user_uuid: str) -> t.List[WSConnection]:
+        return list(self._by_user.get(user_uuid, ()))
+
+    def get_idle(self, timeout: float) -> t.List[WSConnection]:
+        """
+        Returns connections which haven't received anything for timeout seconds.
+        """
+
+        return [c for c in self if c.idle_time > timeout]
+
+    @property
+    def users(self) -> t.Set[str]:
+        """
+        Uuids of users having at least one live connection.
+        """
+
+        return {user_uuid for user_uuid, c in self._by_user.items() if c}
+
+    @property
+    def users_count(self) -> int:
+        return len(self.users)
+
+    @property
+    def stats(self) -> t.Dict[str, int]:
+        connections = list(self)
+        return {
+            'connections': len(connections),
+            'users': self.users_count,
+            'topics': len(self._by_topic),
+            'queued_bytes': sum(c.queued_bytes for c in connections),
+            'bytes_sent': sum(c.bytes_sent for c in connections),
+            'memory_estimate': sum(c.memory_estimate for c in connections),
+        }
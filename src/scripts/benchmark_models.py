@@ -0,0 +1,93 @@
+import argparse
+import datetime
+import time
+import tracemalloc
+import typing as t
+import uuid
+
+from apps.messages.models import MessageModel
+from core.cli.base import BaseAppCommand
+
+
+class BenchmarkModelsAppCommand(BaseAppCommand):
+    name: str = 'benchmark_models'
+    help: str = 'Measures the model hydration speed and the memory per model.'
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=100000,
+            help='Number of models to be created in every run.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of runs, the best one is shown.',
+        )
+
+    @staticmethod
+    def get_document() -> t.Dict[str, t.Any]:
+        """
+        Returns a document shaped like the stored messages.
+        """
+
+        return {
+            '_id': uuid.uuid4().hex[:24],
+            'uuid': str(uuid.uuid4()),
+            'text': 'text',
+            'room': 'general',
+            'author_uuid': str(uuid.uuid4()),
+            'created_at': datetime.datetime.now(),
+            'version': 0,
+        }
+
+    @staticmethod
+    def measure(func: t.Callable[[], t.Any], number: int, repeat: int) -> float:
+        """
+        Returns the best rate of calls per second.
+        """
+
+        best = None
+
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+
+            for _ in range(number):
+                func()
+
+            elapsed = time.perf_counter() - started_at
+            best = elapsed if best is None else min(best, elapsed)
+
+        return number / best
+
+    @staticmethod
+    def measure_memory(func: t.Callable[[], t.Any], number: int) -> float:
+        """
+        Returns the number of bytes allocated per created object.
+        """
+
+        tracemalloc.start()
+        objs = [func() for _ in range(number)]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del objs
+        return size / number
+
+    async def handle(self, parsed_args: argparse.Namespace) -> None:
+        document = self.get_document()
+        model = MessageModel.from_db(document)
+        number, repeat = parsed_args.number, parsed_args.repeat
+
+        rows = [
+            ('Model(**document)', lambda: MessageModel(**document)),
+            ('Model.from_db(document)', lambda: MessageModel.from_db(document)),
+            ('model.as_dict', lambda: model.as_dict),
+        ]
+
+        for title, func in rows:
+            print(f'{title:<26}{self.measure(func, number, repeat):>14,.0f} ops/s')
+
+        bytes_per_model = self.measure_memory(lambda: MessageModel.from_db(document), number)
+        print(f'{"bytes per model":<26}{bytes_per_model:>14,.0f}')
@@ -0,0 +1,34 @@
+import argparse
+
+from motor import motor_asyncio
+
+from apps.users.query_sets import UsersQS
+from conf import settings
+from core.cli.base import BaseAppCommand
+
+
+class MakeAdminAppCommand(BaseAppCommand):
+    name: str = 'make_admin'
+    help: str = 'Grants or revokes the administrator role of a user.'
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument('username', type=str)
+        parser.add_argument(
+            '--revoke',
+            action='store_true',
+            help='Revokes the role instead of granting it.',
+        )
+
+    async def handle(self, parsed_args: argparse.Namespace) -> None:
+        mongo_client = motor_asyncio.AsyncIOMotorClient(settings.MONGO_URL)
+        db = mongo_client.get_database()
+
+        user = await UsersQS(db=db).update_one(
+            where={'username': parsed_args.username},
+            data={'is_admin': not parsed_args.revoke},
+        )
+
+        if not user:
+            print(f'User "{parsed_args.username}" not found.')
+
+        mongo_client.close()
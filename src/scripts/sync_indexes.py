@@ -0,0 +1,64 @@
+import argparse
+
+from motor import motor_asyncio
+
+from conf import settings
+from core.cli.base import BaseAppCommand
+from core.utils import import_string
+
+
+class SyncIndexesAppCommand(BaseAppCommand):
+    name: str = 'sync_indexes'
+    help: str = 'Compares the declared indexes with the existing ones and builds the missing ones.'
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only shows the difference.',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Also drops undeclared indexes and rebuilds the ones with changed options.',
+        )
+
+    async def handle(self, parsed_args: argparse.Namespace) -> None:
+        mongo_client = motor_asyncio.AsyncIOMotorClient(settings.MONGO_URL)
+        db = mongo_client.get_database()
+
+        for path in settings.INDEXED_QUERY_SET_CLASSES:
+            query_set = import_string(path)(db=db)
+            collection = query_set.collection
+            diff = await query_set.diff_indexes()
+
+            for index in diff.existing:
+                print(f'{collection.name}: {index.name} is up to date')
+
+            for index in diff.missing:
+                print(f'{collection.name}: {index.name} is missing')
+
+            for name, index in diff.changed.items():
+                print(f'{collection.name}: {name} differs from {index.name} {index.options}')
+
+                if parsed_args.drop and not parsed_args.dry_run:
+                    await collection.drop_index(name)
+                    diff.missing.append(index)
+
+            for name in diff.extra:
+                print(f'{collection.name}: {name} is not declared')
+
+                if parsed_args.drop and not parsed_args.dry_run:
+                    await collection.drop_index(name)
+                    print(f'{collection.name}: {name} is dropped')
+
+            if not parsed_args.dry_run:
+                built = await query_set.ensure_indexes(diff)
+
+                for index in diff.missing:
+                    if index in built:
+                        print(f'{collection.name}: {index.name} is built')
+                    else:
+                        print(f'{collection.name}: {index.name} cannot be built, see the error above')
+
+        mongo_client.close()
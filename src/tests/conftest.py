@@ -0,0 +1,5 @@
+import os
+import sys
+
+os.environ.setdefault('SETTINGS_MODULE', 'conf.dev')
+sys.path.insert(0, os.path.abspath(os.path.join(__file__, '..', '..')))
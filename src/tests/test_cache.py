@@ -0,0 +1,77 @@
+from core.cache import LRUCache
+
+
+def test_get_returns_set_value():
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+
+
+def test_entry_of_other_version_is_a_miss():
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1, version=1)
+
+    assert cache.get('a', version=2) is None
+    # the outdated entry is dropped
+    assert cache.get('a', version=1) is None
+    assert len(cache) == 0
+
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr('core.cache.time.monotonic', lambda: now)
+    cache = LRUCache(max_size=2, ttl=10)
+    cache.set('a', 1)
+
+    now = 109.0
+    assert cache.get('a') == 1
+
+    now = 110.0
+    assert cache.get('a') is None
+
+
+def test_delete_and_delete_where():
+    cache = LRUCache(max_size=10)
+
+    for i in range(4):
+        cache.set(i, {'room': 'even' if i % 2 == 0 else 'odd'})
+
+    cache.delete(0)
+    cache.delete(0)
+    cache.delete_where(lambda value: value['room'] == 'odd')
+
+    assert [i for i in range(4) if cache.get(i) is not None] == [2]
+    assert cache.invalidations == 3
+
+
+def test_stats():
+    cache = LRUCache(max_size=1)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+
+    assert cache.stats == {
+        'size': 1,
+        'max_size': 1,
+        'hits': 1,
+        'misses': 1,
+        'hit_ratio': 0.5,
+        'evictions': 0,
+        'invalidations': 0,
+    }
@@ -0,0 +1,69 @@
+import asyncio
+
+from core.db.counts import CachedCount, CountCache
+
+
+class FakeObjects:
+    collection_name = 'messages'
+
+    def __init__(self, where, count, cache=None):
+        self.where = where
+        self._count = count
+        self.cache = cache
+        self.calls = 0
+
+    async def count(self):
+        self.calls += 1
+
+        if self.cache is not None:
+            # another request writes while this one is counting
+            self.cache.invalidate(self.collection_name)
+
+        return self._count
+
+
+def test_key_does_not_depend_on_filter_order():
+    assert CountCache.get_key('m', {'a': 1, 'b': 2}) == CountCache.get_key('m', {'b': 2, 'a': 1})
+    assert CountCache.get_key('m', None) == CountCache.get_key('m', {})
+
+
+def test_invalidate_hides_counts_of_the_collection_only():
+    cache = CountCache(max_size=10, ttl=None)
+    cache.set('messages', {'room': 'a'}, 5, generation=0)
+    cache.set('users', None, 2, generation=0)
+
+    assert cache.get('messages', {'room': 'a'}) == 5
+
+    cache.invalidate('messages')
+
+    assert cache.get('messages', {'room': 'a'}) is None
+    assert cache.get('users', None) == 2
+
+
+def test_count_of_outdated_generation_is_not_served():
+    cache = CountCache(max_size=10, ttl=None)
+    cache.invalidate('messages')
+    cache.set('messages', None, 5, generation=0)
+
+    assert cache.get('messages', None) is None
+
+
+def test_cached_count():
+    cache = CountCache(max_size=10, ttl=None)
+    strategy = CachedCount(cache=cache)
+    objects = FakeObjects({'room': 'a'}, 3)
+
+    assert asyncio.run(strategy.count(objects)) == 3
+    assert asyncio.run(strategy.count(objects)) == 3
+    assert objects.calls == 1
+
+
+def test_cached_count_made_during_a_write_is_recounted():
+    cache = CountCache(max_size=10, ttl=None)
+    strategy = CachedCount(cache=cache)
+    objects = FakeObjects(None, 3, cache=cache)
+
+    asyncio.run(strategy.count(objects))
+    asyncio.run(strategy.count(objects))
+
+    assert objects.calls == 2
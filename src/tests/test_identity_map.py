@@ -0,0 +1,87 @@
+from core.db import models
+from core.db.identity_map import IdentityMap
+
+
+class User(models.Model):
+    _id = models.Field(is_required=False)
+    uuid = models.Field()
+    username = models.Field()
+
+
+KEY_FIELDS = ['_id', 'uuid', 'username']
+
+
+def load(**data):
+    return User.from_db(dict({'_id': 1, 'uuid': 'u1', 'username': 'alice'}, **data))
+
+
+def test_model_is_found_by_key_fields():
+    identity_map = IdentityMap()
+    user = load()
+    identity_map.add('users', KEY_FIELDS, user)
+
+    assert identity_map.get('users', '_id', 1) is user
+    assert identity_map.get('users', 'uuid', 'u1') is user
+    assert identity_map.get('users', 'username', 'alice') is user
+    assert identity_map.get('messages', '_id', 1) is None
+    assert (identity_map.hits, identity_map.misses) == (3, 1)
+
+
+def test_same_document_returns_kept_model():
+    identity_map = IdentityMap()
+    user = identity_map.add('users', KEY_FIELDS, load())
+
+    assert identity_map.add('users', KEY_FIELDS, load()) is user
+
+
+def test_model_with_projection_serves_only_its_fields():
+    identity_map = IdentityMap()
+    partial_user = identity_map.add('users', KEY_FIELDS, load(), fields=['uuid'])
+
+    assert identity_map.get('users', 'uuid', 'u1', fields=['uuid']) is partial_user
+    assert identity_map.get('users', 'uuid', 'u1') is None
+    # the username isn't loaded, so the model can't be found by it
+    assert identity_map.get('users', 'username', 'alice', fields=['uuid']) is None
+
+    user = identity_map.add('users', KEY_FIELDS, load())
+
+    assert user is not partial_user
+    assert identity_map.get('users', 'uuid', 'u1') is user
+
+
+def test_update_follows_changed_key():
+    identity_map = IdentityMap()
+    user = identity_map.add('users', KEY_FIELDS, load())
+    user.username = 'bob'
+    identity_map.update('users', KEY_FIELDS, user)
+
+    assert identity_map.get('users', 'username', 'bob') is user
+    assert identity_map.get('users', 'username', 'alice') is None
+
+
+def test_update_with_other_model_forgets_document():
+    identity_map = IdentityMap()
+    identity_map.add('users', KEY_FIELDS, load())
+    identity_map.update('users', KEY_FIELDS, load(username='bob'))
+
+    assert identity_map.get('users', '_id', 1) is None
+
+
+def test_find_id():
+    identity_map = IdentityMap()
+    identity_map.add('users', KEY_FIELDS, load())
+
+    assert identity_map.find_id('users', {'uuid': 'u1'}) == 1
+    assert identity_map.find_id('users', {'_id': 2}) == 2
+    assert identity_map.find_id('users', {'uuid': {'$in': ['u1']}}) is None
+    assert identity_map.find_id('users', {'uuid': 'u1', 'username': 'alice'}) is None
+
+
+def test_clear_collection():
+    identity_map = IdentityMap()
+    identity_map.add('users', KEY_FIELDS, load())
+    identity_map.add('messages', ['_id'], load())
+    identity_map.clear('users')
+
+    assert identity_map.get('users', '_id', 1) is None
+    assert identity_map.get('messages', '_id', 1) is not None
@@ -0,0 +1,68 @@
+import pytest
+
+from core.db.indexes import Index, diff_indexes
+
+
+def get_info(*keys, **options):
+    return dict({'v': 2, 'key': list(keys)}, **options)
+
+
+def test_name_and_keys():
+    index = Index('room', '-created_at')
+
+    assert index.name == 'room_1_created_at_-1'
+    assert index.keys == [('room', 1), ('created_at', -1)]
+
+
+@pytest.mark.parametrize('fields, options', [
+    ((), {}),
+    (('a', 'b'), {'expire_after_seconds': 10}),
+])
+def test_invalid_declaration(fields, options):
+    with pytest.raises(ValueError):
+        Index(*fields, **options)
+
+
+def test_has_keys_of_special_and_float_directions():
+    index = Index('room', '-created_at')
+
+    assert index.has_keys(get_info(('room', 1.0), ('created_at', -1.0)))
+    assert not index.has_keys(get_info(('room', 'hashed')))
+    assert not index.has_keys(get_info(('_fts', 'text'), ('_ftsx', 1)))
+
+
+def test_has_options_with_zero_ttl():
+    index = Index('created_at', expire_after_seconds=0)
+
+    assert index.has_options(get_info(('created_at', 1), expireAfterSeconds=0))
+    assert not index.has_options(get_info(('created_at', 1)))
+    assert not Index('created_at').has_options(get_info(('created_at', 1), expireAfterSeconds=0))
+
+
+def test_diff_indexes():
+    declared = [
+        Index('uuid', unique=True),
+        Index('author_uuid'),
+        Index('room', '-created_at'),
+    ]
+    existing = {
+        '_id_': get_info(('_id', 1)),
+        'uuid_1': get_info(('uuid', 1), unique=True),
+        'author': get_info(('author_uuid', 1), sparse=True),
+        'text_text': get_info(('_fts', 'text'), ('_ftsx', 1)),
+    }
+
+    diff = diff_indexes(declared, existing)
+
+    assert diff
+    assert diff.existing == [declared[0]]
+    assert diff.missing == [declared[2]]
+    assert diff.changed == {'author': declared[1]}
+    assert diff.extra == ['text_text']
+
+
+def test_no_diff():
+    declared = [Index('uuid', unique=True)]
+    existing = {'_id_': get_info(('_id', 1)), 'uuid_1': get_info(('uuid', 1), unique=True)}
+
+    assert not diff_indexes(declared, existing)
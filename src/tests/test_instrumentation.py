@@ -0,0 +1,78 @@
+import asyncio
+
+from core.db.instrumentation import Histogram, QueryStats, get_filter_shape, get_plan_summary
+
+
+def test_filter_shape_hides_values():
+    where = {'room': 'general', 'uuid': {'$in': ['a', 'b']}, '$or': [{'a': 1}, {'a': 2}, {'b': 3}]}
+
+    assert get_filter_shape(where) == {
+        'room': '?',
+        'uuid': {'$in': ['?']},
+        '$or': [{'a': '?'}, {'b': '?'}],
+    }
+
+
+def test_plan_summary():
+    explain = {
+        'queryPlanner': {'winningPlan': {
+            'stage': 'FETCH',
+            'inputStage': {'stage': 'IXSCAN', 'indexName': 'uuid_1'},
+        }},
+        'executionStats': {'totalDocsExamined': 1, 'totalKeysExamined': 1, 'nReturned': 1},
+    }
+
+    assert get_plan_summary(explain) == {
+        'plan': 'FETCH < IXSCAN uuid_1',
+        'docs_examined': 1,
+        'keys_examined': 1,
+        'returned': 1,
+    }
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+
+    assert histogram.percentile(0.5) is None
+    assert histogram.stats['mean_ms'] is None
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+
+    for duration_ms in [0.5] * 90 + [20] * 9 + [10000]:
+        histogram.add(duration_ms)
+
+    assert histogram.count == 100
+    assert histogram.percentile(0.5) == 1
+    assert histogram.percentile(0.95) == 25
+    # the last bucket is unbounded, the maximum is reported instead
+    assert histogram.percentile(1) == 10000
+    assert histogram.stats['buckets']['le_1'] == 90
+    assert histogram.stats['buckets']['inf'] == 1
+
+
+def test_slow_queries_are_recorded_and_explained():
+    async def explain():
+        return {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}}}
+
+    async def main():
+        stats = QueryStats(slow_query_ms=100, slow_query_log_size=1, explain_slow_queries=True)
+        stats.record('messages', 'find', 5, {'room': 'a'}, explain)
+        stats.record('messages', 'find', 150, {'room': 'a'}, explain)
+
+        assert len(stats._explain_tasks) == 1
+        await asyncio.gather(*stats._explain_tasks)
+        assert not stats._explain_tasks
+        return stats
+
+    stats = asyncio.run(main())
+
+    assert stats.stats['messages.find']['count'] == 2
+    assert stats.slow_query_stats['recent'] == [{
+        'collection': 'messages',
+        'operation': 'find',
+        'filter': {'room': '?'},
+        'duration_ms': 150,
+        'explain': {'plan': 'COLLSCAN', 'docs_examined': None, 'keys_examined': None, 'returned': None},
+    }]
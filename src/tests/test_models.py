@@ -0,0 +1,51 @@
+from core.db import models
+
+
+class Note(models.Model):
+    _id = models.Field(is_required=False)
+    text = models.Field(default='')
+    room = models.Field(default='general')
+
+
+def test_loaded_model_has_no_changes():
+    note = Note.from_db({'_id': 1, 'text': 'a'})
+
+    assert note.changed_fields == frozenset()
+    assert note.get_changes() == {}
+    assert note.room == 'general'
+
+
+def test_assignment_marks_field_changed():
+    note = Note.from_db({'_id': 1, 'text': 'a', 'room': 'general'})
+    note.text = 'b'
+
+    assert note.changed_fields == {'text'}
+    assert note.get_changes() == {'text': 'b'}
+
+
+def test_assigning_same_value_is_not_a_change():
+    note = Note.from_db({'_id': 1, 'text': 'a', 'room': 'general'})
+    note.text = 'a'
+    note.set_values({'room': 'general', 'unknown': 1})
+
+    assert note.get_changes() == {}
+
+
+def test_set_values_changes_only_differing_fields():
+    note = Note.from_db({'_id': 1, 'text': 'a', 'room': 'general'})
+    note.set_values({'text': 'a', 'room': 'other'})
+
+    assert note.get_changes() == {'room': 'other'}
+
+
+def test_mark_clean_forgets_changes():
+    note = Note.from_db({'_id': 1, 'text': 'a'})
+    note.text = 'b'
+    note.mark_clean()
+
+    assert note.get_changes() == {}
+    assert note.text == 'b'
+
+    note.text = 'c'
+
+    assert note.changed_fields == {'text'}
@@ -0,0 +1,46 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from core.paginators import KeysetPaginator
+from core.serialization.exceptions import ValidationError
+
+
+def test_cursor_round_trip():
+    paginator = KeysetPaginator()
+    keys = [datetime.datetime(2019, 10, 1, 12, 30), ObjectId()]
+
+    cursor = paginator.encode_cursor(keys, backwards=True)
+
+    assert '=' not in cursor
+    assert paginator.decode_cursor(cursor) == (keys, True)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    'e30',  # {}
+    KeysetPaginator().encode_cursor(['only one key'], backwards=False),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValidationError):
+        KeysetPaginator().decode_cursor(cursor)
+
+
+def test_keyset_filter():
+    paginator = KeysetPaginator()
+
+    assert paginator.get_keyset_filter(['date', 'id'], backwards=False) == {'$or': [
+        {'created_at': {'$lt': 'date'}},
+        {'created_at': 'date', '_id': {'$lt': 'id'}},
+    ]}
+
+
+def test_keyset_filter_backwards():
+    paginator = KeysetPaginator()
+    paginator.ordering = ('room', '-created_at')
+
+    assert paginator.get_keyset_filter(['general', 'date'], backwards=True) == {'$or': [
+        {'room': {'$lt': 'general'}},
+        {'room': 'general', 'created_at': {'$gt': 'date'}},
+    ]}
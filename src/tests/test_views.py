@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from core import views
+
+
+class FakeStreamResponse:
+    def __init__(self, status, headers):
+        self.status = status
+        self.headers = headers
+        self.content_type = None
+        self.chunks = []
+        self.eof = False
+
+    def enable_chunked_encoding(self):
+        pass
+
+    async def prepare(self, request):
+        pass
+
+    async def write(self, data):
+        self.chunks.append(data)
+
+    async def write_eof(self):
+        self.eof = True
+
+
+class FakeModel:
+    def __init__(self, value):
+        self.as_dict = {'value': value}
+
+
+class FakeSerializer:
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.calls = 0
+
+    async def serialize_many(self, objs):
+        self.calls += 1
+
+        if self.calls == self.fail_at:
+            raise RuntimeError('broken')
+
+        return list(objs)
+
+
+class FakeQuerySet(views.QuerySet):
+    def __init__(self, models):
+        self.models = models
+
+    async def chunks(self, size):
+        for i in range(0, len(self.models), size):
+            yield self.models[i:i + size]
+
+
+class FakeRequest(dict):
+    transport = None
+
+
+@pytest.fixture
+def view(monkeypatch):
+    monkeypatch.setattr(views, 'StreamResponse', FakeStreamResponse)
+    view = views.ListApiView(FakeRequest())
+    view.stream_chunk_size = 2
+    return view
+
+
+def test_stream_objects_by_chunks(view):
+    objects = FakeQuerySet([FakeModel(i) for i in range(3)])
+
+    response = asyncio.run(view.stream_objects(objects, FakeSerializer()))
+
+    assert response.chunks == [b'[{"value":0},{"value":1}', b',{"value":2}', b']']
+    assert response.eof
+
+
+@pytest.mark.parametrize('objects', [[], FakeQuerySet([])])
+def test_stream_no_objects(view, objects):
+    response = asyncio.run(view.stream_objects(objects, FakeSerializer()))
+
+    assert response.chunks == [b'[]']
+
+
+def test_stream_error_breaks_array_of_gone_client(view):
+    objects = FakeQuerySet([FakeModel(i) for i in range(3)])
+
+    response = asyncio.run(view.stream_objects(objects, FakeSerializer(fail_at=2)))
+
+    assert response.chunks == [b'[{"value":0},{"value":1}']
+    assert not response.eof